@@ -0,0 +1,97 @@
+import datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Query, Request, Response
+
+from beaverhabits import views
+from beaverhabits.conditional import check_not_modified, stamp_headers
+from beaverhabits.logging import logger
+from beaverhabits.storage.flush import coalescer
+from beaverhabits.storage.storage import HabitList
+
+from .db import User
+from .schemas import CheckedRecord, HabitRead, TickBatch, TickBatchResult
+from .users import current_active_user
+
+router = APIRouter(prefix="/api/v1", tags=["api"])
+
+
+async def load_habit_list(
+    request: Request, response: Response, user: User
+) -> Optional[HabitList]:
+    """Habit list of the user, 304 when the client copy is current"""
+    if (stamp := await views.get_user_habit_list_stamp(user)) is not None:
+        check_not_modified(request, stamp)
+
+    habit_list = await views.get_user_habit_list(user)
+    if habit_list is not None and (stamp := habit_list.stamp) is not None:
+        check_not_modified(request, stamp)
+        response.headers.update(stamp_headers(stamp))
+    return habit_list
+
+
+@router.get("/habits", response_model=List[HabitRead])
+async def list_habits(
+    request: Request, response: Response, user: User = Depends(current_active_user)
+):
+    habit_list = await load_habit_list(request, response, user)
+    if habit_list is None:
+        return []
+    return [
+        HabitRead(id=str(h.id), name=h.name, star=h.star) for h in habit_list.habits
+    ]
+
+
+@router.get("/habits/{habit_id}/records", response_model=List[CheckedRecord])
+async def list_habit_records(
+    request: Request,
+    response: Response,
+    habit_id: str,
+    start: Optional[datetime.date] = Query(None, alias="from"),
+    end: Optional[datetime.date] = Query(None, alias="to"),
+    user: User = Depends(current_active_user),
+):
+    habit_list = await load_habit_list(request, response, user)
+    if habit_list is None:
+        raise HTTPException(status_code=404, detail="Habit list not found")
+    if (habit := await habit_list.get_habit_by(habit_id)) is None:
+        raise HTTPException(status_code=404, detail="Habit not found")
+
+    if start is not None and end is not None:
+        records = habit.get_records_between(start, end)
+    else:
+        records = [
+            r
+            for r in habit.records
+            if (start is None or start <= r.day) and (end is None or r.day <= end)
+        ]
+    return [CheckedRecord(day=r.day, done=r.done) for r in records]
+
+
+@router.post("/ticks", response_model=TickBatchResult)
+async def post_ticks(batch: TickBatch, user: User = Depends(current_active_user)):
+    habit_list = await views.get_user_habit_list(user)
+    if habit_list is None:
+        raise HTTPException(status_code=404, detail="Habit list not found")
+
+    # Validate every habit before changing any of them
+    changes = {}
+    for tick in batch.ticks:
+        if tick.habit_id not in changes:
+            if (habit := await habit_list.get_habit_by(tick.habit_id)) is None:
+                raise HTTPException(
+                    status_code=404, detail=f"Habit {tick.habit_id} not found"
+                )
+            changes[tick.habit_id] = (habit, {})
+        changes[tick.habit_id][1][tick.day] = tick.done
+
+    # One write of the habit list for the whole batch, writes are keyed by user
+    with coalescer.hold(user.email):
+        for habit, days in changes.values():
+            await habit.tick_many(days)
+    logger.info(f"[API] User {user.id} ticked {len(batch.ticks)} days")
+    return TickBatchResult(ticked=len(batch.ticks))
+
+
+def init_api_routes(app: FastAPI) -> None:
+    app.include_router(router)
@@ -1,13 +1,25 @@
 import contextlib
+import hashlib
+import time
+from dataclasses import dataclass
 from typing import Optional
 
+import jwt
+from fastapi import HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
+from fastapi.security.utils import get_authorization_scheme_param
+from fastapi_users import exceptions
 from fastapi_users.exceptions import UserAlreadyExists
+from fastapi_users.jwt import decode_jwt
 from nicegui import app
 
 from beaverhabits.app.schemas import UserCreate
+from beaverhabits.configs import settings
+from beaverhabits.logging import logger
+from beaverhabits.storage.cache import LRUCache
 
 from .db import User, get_async_session, get_user_db
+from .password import HashingBusy, LoopTimer
 from .users import get_jwt_strategy, get_user_manager
 
 get_async_session_context = contextlib.asynccontextmanager(get_async_session)
@@ -15,19 +27,79 @@ get_user_db_context = contextlib.asynccontextmanager(get_user_db)
 get_user_manager_context = contextlib.asynccontextmanager(get_user_manager)
 
 
+@dataclass
+class VerifiedToken:
+    user: User
+    # JWT expiry, seconds since epoch
+    expires_at: float
+
+
+@dataclass
+class DecodedToken:
+    # Token digest, the key of token_cache
+    key: str
+    claims: dict
+
+
+# Request scope keys of the user, or in stateless mode the token, resolved
+# by AuthMiddleware
+SCOPE_USER_KEY = "user"
+SCOPE_TOKEN_KEY = "token"
+
+# Verified tokens by digest
+token_cache: LRUCache[str, VerifiedToken] = LRUCache(
+    settings.AUTH_TOKEN_CACHE_ENTRIES, ttl=settings.AUTH_TOKEN_CACHE_SECONDS
+)
+
+
+def token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def decode_token(token: str) -> Optional[dict]:
+    strategy = get_jwt_strategy()
+    try:
+        return decode_jwt(
+            token,
+            strategy.decode_key,
+            strategy.token_audience,
+            algorithms=[strategy.algorithm],
+        )
+    except jwt.PyJWTError:
+        return None
+
+
+async def timed[T](name: str, timer: LoopTimer[T]) -> T:
+    start = time.perf_counter()
+    try:
+        return await timer
+    finally:
+        elapsed = time.perf_counter() - start
+        logger.info(
+            f"[Auth] {name} took {elapsed * 1000:.1f} ms, "
+            + f"{timer.seconds * 1000:.1f} ms on the event loop"
+        )
+
+
+async def _user_authenticate(email: str, password: str) -> Optional[User]:
+    async with get_async_session_context() as session:
+        async with get_user_db_context(session) as user_db:
+            async with get_user_manager_context(user_db) as user_manager:
+                # user_logout()
+                credentials = OAuth2PasswordRequestForm(
+                    username=email, password=password
+                )
+                user = await user_manager.authenticate(credentials)
+                if user is None or not user.is_active:
+                    return None
+                return user
+
+
 async def user_authenticate(email: str, password: str) -> Optional[User]:
     try:
-        async with get_async_session_context() as session:
-            async with get_user_db_context(session) as user_db:
-                async with get_user_manager_context(user_db) as user_manager:
-                    # user_logout()
-                    credentials = OAuth2PasswordRequestForm(
-                        username=email, password=password
-                    )
-                    user = await user_manager.authenticate(credentials)
-                    if user is None or not user.is_active:
-                        return None
-                    return user
+        return await timed("login", LoopTimer(_user_authenticate(email, password)))
+    except HashingBusy:
+        raise
     except:
         return None
 
@@ -49,43 +121,127 @@ async def user_create_token(user: User) -> Optional[str]:
         return None
 
 
-async def user_check_token(token: str | None) -> bool:
+def _cached_user(key: str) -> Optional[User]:
+    if (verified := token_cache.get(key)) is not None:
+        if verified.expires_at > time.time():
+            return verified.user
+        token_cache.pop(key)
+    return None
+
+
+async def _load_user(key: str, claims: dict) -> Optional[User]:
+    if claims.get("sub") is None:
+        return None
+
     try:
         async with get_async_session_context() as session:
             async with get_user_db_context(session) as user_db:
                 async with get_user_manager_context(user_db) as user_manager:
-                    if token is None:
-                        return False
-                    strategy = get_jwt_strategy()
-                    user = await strategy.read_token(token, user_manager)
-                    if user is None or not user.is_active:
-                        return False
-                    else:
-                        return True
+                    user_id = user_manager.parse_id(claims["sub"])
+                    user = await user_manager.get(user_id)
+    except (exceptions.UserNotExists, exceptions.InvalidID):
+        return None
+    if not user.is_active:
+        return None
+
+    token_cache.put(key, VerifiedToken(user, claims.get("exp", float("inf"))))
+    return user
+
+
+async def user_from_token(token: str | None) -> Optional[User]:
+    if not token:
+        return None
+
+    key = token_digest(token)
+    if (user := _cached_user(key)) is not None:
+        return user
+
+    claims = decode_token(token)
+    if claims is None:
+        return None
+    return await _load_user(key, claims)
+
+
+async def user_check_token(token: str | None) -> bool:
+    # Trust the signed claims without loading the user
+    if settings.AUTH_STATELESS:
+        return bool(token) and decode_token(token) is not None  # type: ignore
+
+    try:
+        return await user_from_token(token) is not None
     except:
         return False
 
 
+async def user_authenticate_request(scope: dict, token: str | None) -> bool:
+    """Check the token of a request and keep its user in the request scope
+
+    In stateless mode the decoded claims are kept instead, and the user is
+    loaded only by pages asking for it.
+    """
+    if settings.AUTH_STATELESS:
+        claims = decode_token(token) if token else None
+        if claims is None:
+            return False
+        scope[SCOPE_TOKEN_KEY] = DecodedToken(token_digest(token), claims)  # type: ignore
+        return True
+
+    try:
+        user = await user_from_token(token)
+    except:
+        return False
+    if user is None:
+        return False
+
+    scope[SCOPE_USER_KEY] = user
+    return True
+
+
+async def current_page_user(request: Request) -> User:
+    """Page dependency reusing the user or token resolved by AuthMiddleware"""
+    user = request.scope.get(SCOPE_USER_KEY)
+    if user is None and (decoded := request.scope.get(SCOPE_TOKEN_KEY)) is not None:
+        user = _cached_user(decoded.key) or await _load_user(
+            decoded.key, decoded.claims
+        )
+    if user is None:
+        scheme, token = get_authorization_scheme_param(
+            request.headers.get("authorization")
+        )
+        if scheme.lower() == "bearer":
+            user = await user_from_token(token)
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+    return user
+
+
+async def _user_create(email: str, password: str, is_superuser: bool) -> User:
+    async with get_async_session_context() as session:
+        async with get_user_db_context(session) as user_db:
+            async with get_user_manager_context(user_db) as user_manager:
+                user = await user_manager.create(
+                    UserCreate(
+                        email=email,
+                        password=password,
+                        is_superuser=is_superuser,
+                    )
+                )
+                return user
+
+
 async def user_create(
     email: str, password: str, is_superuser: bool = False
 ) -> Optional[User]:
     try:
-        async with get_async_session_context() as session:
-            async with get_user_db_context(session) as user_db:
-                async with get_user_manager_context(user_db) as user_manager:
-                    user = await user_manager.create(
-                        UserCreate(
-                            email=email,
-                            password=password,
-                            is_superuser=is_superuser,
-                        )
-                    )
-                    return user
+        timer = LoopTimer(_user_create(email, password, is_superuser))
+        return await timed("register", timer)
     except UserAlreadyExists:
         raise Exception("User already exists!")
 
 
 def user_logout() -> bool:
+    if token := app.storage.user.get("auth_token"):
+        token_cache.pop(token_digest(token))
     app.storage.user.update({"auth_token": ""})
     app.storage.user.clear()
     return True
@@ -1,36 +1,62 @@
 import contextlib
+import datetime
+import hashlib
+import json
+from typing import Optional
 
-from sqlalchemy import select
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
 
 from beaverhabits.logging import logger
 
-from .db import HabitListModel, User, get_async_session
+from .db import (
+    HabitListModel,
+    HabitModel,
+    HabitRecordModel,
+    User,
+    engine,
+    get_async_session,
+)
 
 get_async_session_context = contextlib.asynccontextmanager(get_async_session)
 
+# INSERT ... ON CONFLICT is dialect specific in SQLAlchemy
+insert = postgresql.insert if engine.dialect.name == "postgresql" else sqlite.insert
+
+# Stay below the bound parameter limit of SQLite
+UPSERT_CHUNK_SIZE = 1000
+
+
+def content_hash(data: dict) -> str:
+    content = json.dumps(data, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(content.encode()).hexdigest()
+
 
 async def update_user_habit_list(user: User, data: dict) -> None:
     async with get_async_session_context() as session:
-        stmt = select(HabitListModel).where(HabitListModel.user_id == user.id)
+        stmt = insert(HabitListModel).values(
+            user_id=user.id, data=data, content_hash=content_hash(data), version=1
+        )
+        # Skip the write if nothing changed, without reading the row first
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[HabitListModel.user_id],
+            set_={
+                "data": stmt.excluded.data,
+                "content_hash": stmt.excluded.content_hash,
+                "version": HabitListModel.version + 1,
+                "updated_at": func.now(),
+            },
+            where=HabitListModel.content_hash.is_distinct_from(
+                stmt.excluded.content_hash
+            ),
+        )
         result = await session.execute(stmt)
-        habit_list = result.scalar()
-        logger.info(f"[CRUD] User {user.id} habit list query")
-
-        if not habit_list:
-            session.add(
-                HabitListModel(data=data, user_id=user.id),
-            )
-            await session.commit()
-            logger.info(f"[CRUD] User {user.id} habit list created")
-            return
+        await session.commit()
 
-        if habit_list.data == data:
+        if result.rowcount:
+            logger.info(f"[CRUD] User {user.id} habit list saved")
+        else:
             logger.warn(f"[CRUD] User {user.id} habit list unchanged")
-            return
-
-        habit_list.data = data
-        await session.commit()
-        logger.info(f"[CRUD] User {user.id} habit list updated")
 
 
 async def get_user_habit_list(user: User) -> HabitListModel | None:
@@ -41,6 +67,19 @@ async def get_user_habit_list(user: User) -> HabitListModel | None:
         return result.scalar()
 
 
+async def get_user_habit_list_version(
+    user: User,
+) -> tuple[str | None, datetime.datetime] | None:
+    """Content hash and update time of the habit list, without its data"""
+    async with get_async_session_context() as session:
+        stmt = select(HabitListModel.content_hash, HabitListModel.updated_at).where(
+            HabitListModel.user_id == user.id
+        )
+        result = await session.execute(stmt)
+        row = result.first()
+        return None if row is None else (row.content_hash, row.updated_at)
+
+
 async def get_user_count() -> int:
     async with get_async_session_context() as session:
         stmt = select(User)
@@ -48,3 +87,103 @@ async def get_user_count() -> int:
         user_count = len(result.all())
         logger.info(f"[CRUD] User count query: {user_count}")
         return user_count
+
+
+async def get_user_habits(user: User) -> list[HabitModel]:
+    async with get_async_session_context() as session:
+        stmt = (
+            select(HabitModel)
+            .where(HabitModel.user_id == user.id)
+            .order_by(HabitModel.id)
+        )
+        result = await session.execute(stmt)
+        logger.info(f"[CRUD] User {user.id} habits query")
+        return list(result.scalars())
+
+
+async def get_user_habit_records(
+    user: User,
+    start: Optional[datetime.date] = None,
+    end: Optional[datetime.date] = None,
+) -> list[HabitRecordModel]:
+    async with get_async_session_context() as session:
+        stmt = (
+            select(HabitRecordModel)
+            .join(HabitModel, HabitModel.id == HabitRecordModel.habit_id)
+            .where(HabitModel.user_id == user.id)
+            .order_by(HabitRecordModel.habit_id, HabitRecordModel.day)
+        )
+        if start is not None:
+            stmt = stmt.where(HabitRecordModel.day >= start)
+        if end is not None:
+            stmt = stmt.where(HabitRecordModel.day <= end)
+        result = await session.execute(stmt)
+        logger.info(f"[CRUD] User {user.id} habit records query")
+        return list(result.scalars())
+
+
+async def upsert_user_habit(user: User, uid: str, name: str, star: bool) -> int:
+    async with get_async_session_context() as session:
+        stmt = insert(HabitModel).values(user_id=user.id, uid=uid, name=name, star=star)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[HabitModel.user_id, HabitModel.uid],
+            set_={"name": name, "star": star, "updated_at": func.now()},
+        )
+        result = await session.execute(stmt.returning(HabitModel.id))
+        habit_id = result.scalar_one()
+        await session.commit()
+        logger.info(f"[CRUD] User {user.id} habit {uid} upserted")
+        return habit_id
+
+
+async def update_user_habit(user: User, uid: str, **values) -> None:
+    async with get_async_session_context() as session:
+        stmt = (
+            update(HabitModel)
+            .where(HabitModel.user_id == user.id, HabitModel.uid == uid)
+            .values(**values, updated_at=func.now())
+        )
+        await session.execute(stmt)
+        await session.commit()
+        logger.info(f"[CRUD] User {user.id} habit {uid} updated")
+
+
+async def remove_user_habits(user: User, uids: list[str]) -> None:
+    if not uids:
+        return
+
+    async with get_async_session_context() as session:
+        habit_ids = select(HabitModel.id).where(
+            HabitModel.user_id == user.id, HabitModel.uid.in_(uids)
+        )
+        await session.execute(
+            delete(HabitRecordModel).where(HabitRecordModel.habit_id.in_(habit_ids))
+        )
+        await session.execute(
+            delete(HabitModel).where(
+                HabitModel.user_id == user.id, HabitModel.uid.in_(uids)
+            )
+        )
+        await session.commit()
+        logger.info(f"[CRUD] User {user.id} habits {uids} removed")
+
+
+async def upsert_habit_records(
+    habit_id: int, records: list[tuple[datetime.date, bool]]
+) -> None:
+    async with get_async_session_context() as session:
+        for i in range(0, len(records), UPSERT_CHUNK_SIZE):
+            chunk = records[i : i + UPSERT_CHUNK_SIZE]
+            stmt = insert(HabitRecordModel).values(
+                [
+                    {"habit_id": habit_id, "day": day, "done": done}
+                    for day, done in chunk
+                ]
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[HabitRecordModel.habit_id, HabitRecordModel.day],
+                set_={"done": stmt.excluded.done},
+            )
+            await session.execute(stmt)
+        await session.commit()
+        logger.info(f"[CRUD] Habit {habit_id} {len(records)} records upserted")
@@ -4,7 +4,18 @@ from typing import AsyncGenerator
 from fastapi import Depends
 from fastapi_users.db import SQLAlchemyBaseUserTableUUID, SQLAlchemyUserDatabase
 from fastapi_users_db_sqlalchemy.generics import GUID
-from sqlalchemy import JSON, DateTime, ForeignKey, func
+from sqlalchemy import (
+    JSON,
+    Date,
+    DateTime,
+    ForeignKey,
+    Index,
+    String,
+    UniqueConstraint,
+    func,
+    inspect,
+    text,
+)
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import (
     DeclarativeBase,
@@ -40,14 +51,42 @@ class User(TimestampMixin, SQLAlchemyBaseUserTableUUID, Base):
 
 class HabitListModel(TimestampMixin, Base):
     __tablename__ = "habit_list"
+    # Conflict target of the habit list upsert
+    __table_args__ = (Index("uq_habit_list_user_id", "user_id", unique=True),)
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     data: Mapped[dict] = mapped_column(JSON, nullable=False)
+    content_hash: Mapped[str | None] = mapped_column(String(64))
+    version: Mapped[int] = mapped_column(default=0, server_default="0")
 
     user_id = mapped_column(GUID, ForeignKey("user.id"), index=True)
     user = relationship("User", back_populates="habit_list")
 
 
+class HabitModel(TimestampMixin, Base):
+    __tablename__ = "habit"
+    __table_args__ = (UniqueConstraint("user_id", "uid"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True, index=True)
+    # Habit id exposed to pages, e.g. /gui/habits/{uid}
+    uid: Mapped[str] = mapped_column(String(32), nullable=False)
+    name: Mapped[str] = mapped_column(String, nullable=False)
+    star: Mapped[bool] = mapped_column(default=False)
+
+    user_id = mapped_column(GUID, ForeignKey("user.id"), index=True)
+
+
+class HabitRecordModel(Base):
+    __tablename__ = "habit_record"
+    __table_args__ = (UniqueConstraint("habit_id", "day"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True, index=True)
+    day: Mapped[datetime.date] = mapped_column(Date, nullable=False)
+    done: Mapped[bool] = mapped_column(nullable=False)
+
+    habit_id = mapped_column(ForeignKey("habit.id"), nullable=False)
+
+
 # SSL Mode: https://www.postgresql.org/docs/9.0/libpq-ssl.html#LIBPQ-SSL-SSLMODE-STATEMENTS
 # p.s. asyncpg us ssl instead of sslmode: https://github.com/tortoise/aerich/issues/310
 connect_args = {}
@@ -57,9 +96,37 @@ engine = create_async_engine(DATABASE_URL, connect_args=connect_args)
 async_session_maker = async_sessionmaker(engine, expire_on_commit=False)
 
 
+def migrate_habit_list_table(conn) -> None:
+    """Add the columns and index introduced after `habit_list` was created"""
+    inspector = inspect(conn)
+    columns = {c["name"] for c in inspector.get_columns("habit_list")}
+    if "content_hash" not in columns:
+        conn.execute(text("ALTER TABLE habit_list ADD COLUMN content_hash VARCHAR(64)"))
+    if "version" not in columns:
+        conn.execute(
+            text("ALTER TABLE habit_list ADD COLUMN version INTEGER DEFAULT 0 NOT NULL")
+        )
+
+    indexes = {i["name"] for i in inspector.get_indexes("habit_list")}
+    if "uq_habit_list_user_id" in indexes:
+        return
+    # Older tables allowed several lists per user, from racing first saves.
+    # Keep the first one, the only one those versions read and updated.
+    conn.execute(
+        text(
+            "DELETE FROM habit_list WHERE user_id IS NOT NULL AND id NOT IN "
+            + "(SELECT MIN(id) FROM habit_list GROUP BY user_id)"
+        )
+    )
+    conn.execute(
+        text("CREATE UNIQUE INDEX uq_habit_list_user_id ON habit_list (user_id)")
+    )
+
+
 async def create_db_and_tables():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(migrate_habit_list_table)
 
 
 async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
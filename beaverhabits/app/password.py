@@ -0,0 +1,81 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Coroutine, Generator
+
+from beaverhabits.configs import settings
+
+
+class HashingBusy(Exception):
+    pass
+
+
+class PasswordHashExecutor:
+    """Bounded thread pool for password hashing
+
+    At most `max_workers` hashes run at once and `max_queue` more wait for a
+    worker. Any call beyond that is rejected right away with HashingBusy.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int) -> None:
+        self.executor = ThreadPoolExecutor(max_workers, thread_name_prefix="password")
+        self.limit = max_workers + max_queue
+        self.pending = 0
+
+        # Counters
+        self.calls = 0
+        self.rejected = 0
+        self.hash_seconds = 0.0
+
+    async def run[T](self, func: Callable[..., T], *args: Any) -> T:
+        if self.pending >= self.limit:
+            self.rejected += 1
+            raise HashingBusy("Too many login attempts, please try again later")
+
+        def timed() -> T:
+            start = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                self.hash_seconds += time.perf_counter() - start
+
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, timed)
+        finally:
+            self.pending -= 1
+            self.calls += 1
+
+
+class LoopTimer[T]:
+    """Awaitable measuring how long a coroutine runs on the event loop
+
+    Only the steps of the coroutine between two suspensions are counted,
+    the time spent waiting for I/O or for an executor is not.
+    """
+
+    def __init__(self, coroutine: Coroutine[Any, Any, T]) -> None:
+        self.coroutine = coroutine
+        self.seconds = 0.0
+
+    def __await__(self) -> Generator[Any, Any, T]:
+        send, value = self.coroutine.send, None
+        while True:
+            start = time.perf_counter()
+            try:
+                future = send(value)
+            except StopIteration as e:
+                return e.value
+            finally:
+                self.seconds += time.perf_counter() - start
+
+            try:
+                send, value = self.coroutine.send, (yield future)
+            except BaseException as e:
+                send, value = self.coroutine.throw, e
+
+
+password_executor = PasswordHashExecutor(
+    settings.AUTH_HASH_WORKERS, settings.AUTH_HASH_QUEUE_LIMIT
+)
@@ -3,7 +3,10 @@ import uuid
 from typing import List
 
 from fastapi_users import schemas
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+# Ticks accepted by one bulk request
+MAX_TICKS_PER_BATCH = 1000
 
 
 class UserRead(schemas.BaseUser[uuid.UUID]):
@@ -23,15 +26,25 @@ class HabitCreate(BaseModel):
 
 
 class HabitRead(BaseModel):
-    id: int
+    id: str
     name: str
-
-    user: UserRead
-    items: List["CheckedRecord"]
+    star: bool
 
 
 class CheckedRecord(BaseModel):
-    id: str
     day: datetime.date
     done: bool
-    habit: "HabitRead"
+
+
+class Tick(BaseModel):
+    habit_id: str
+    day: datetime.date
+    done: bool
+
+
+class TickBatch(BaseModel):
+    ticks: List[Tick] = Field(max_length=MAX_TICKS_PER_BATCH)
+
+
+class TickBatchResult(BaseModel):
+    ticked: int
@@ -0,0 +1,39 @@
+import email.utils
+
+from fastapi import HTTPException, Request
+
+from beaverhabits.storage.storage import HabitListStamp
+
+
+def stamp_headers(stamp: HabitListStamp) -> dict[str, str]:
+    return {
+        "ETag": stamp.etag,
+        "Last-Modified": email.utils.formatdate(stamp.modified_at, usegmt=True),
+        "Cache-Control": "private, no-cache",
+    }
+
+
+def weak_etag(etag: str) -> str:
+    return etag.strip().removeprefix("W/")
+
+
+def not_modified(request: Request, stamp: HabitListStamp) -> bool:
+    """Whether the client copy is current, If-None-Match wins over If-Modified-Since"""
+    if (if_none_match := request.headers.get("if-none-match")) is not None:
+        etags = {weak_etag(x) for x in if_none_match.split(",")}
+        return "*" in etags or weak_etag(stamp.etag) in etags
+
+    if not (if_modified_since := request.headers.get("if-modified-since")):
+        return False
+    try:
+        since = email.utils.parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    # Last-Modified has a resolution of one second
+    return int(stamp.modified_at) <= since.timestamp()
+
+
+def check_not_modified(request: Request, stamp: HabitListStamp) -> None:
+    """Answer 304 Not Modified when the client copy is current"""
+    if not_modified(request, stamp):
+        raise HTTPException(status_code=304, headers=stamp_headers(stamp))
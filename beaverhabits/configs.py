@@ -14,7 +14,14 @@ USER_DATA_FOLDER = ".user"
 class StorageType(Enum):
     SESSION = "SESSION"
     USER_DATABASE = "DATABASE"
+    USER_DATABASE_TABLES = "DATABASE_TABLES"
     USER_DISK = "USER_DISK"
+    USER_DISK_JOURNAL = "USER_DISK_JOURNAL"
+
+
+class RecordEncoding(Enum):
+    LIST = "LIST"
+    BITSET = "BITSET"
 
 
 class Settings(BaseSettings):
@@ -32,6 +39,29 @@ class Settings(BaseSettings):
     HABITS_STORAGE: StorageType = StorageType.USER_DATABASE
     DATABASE_URL: str = f"sqlite+aiosqlite:///./{USER_DATA_FOLDER}/habits.db"
     MAX_USER_COUNT: int = -1
+    HABITS_RECORD_ENCODING: RecordEncoding = RecordEncoding.LIST
+    # Coalesce habit list writes, 0 to write on every change
+    HABITS_FLUSH_INTERVAL_MS: int = 500
+    HABITS_FLUSH_MAX_DELAY_MS: int = 5000
+    HABITS_FLUSH_MAX_PENDING: int = 100
+    HABITS_JOURNAL_COMPACT_OPS: int = 1000
+    # Read-through cache of habit lists, 0 entries to disable
+    HABITS_CACHE_ENTRIES: int = 256
+    HABITS_CACHE_TTL_SECONDS: int = 300
+    # Loaded user files kept in memory by the disk storage
+    HABITS_DISK_CACHE_ENTRIES: int = 128
+    HABITS_DISK_CACHE_BYTES: int = 64 * 1024 * 1024
+    # Largest habit list upload accepted by the import page
+    IMPORT_MAX_BYTES: int = 10 * 1024 * 1024
+
+    # Auth
+    AUTH_TOKEN_CACHE_ENTRIES: int = 1024
+    AUTH_TOKEN_CACHE_SECONDS: int = 60
+    # Check tokens by their signed claims only, without loading the user
+    AUTH_STATELESS: bool = False
+    # Password hashing threads, and hashes waiting for one before logins are rejected
+    AUTH_HASH_WORKERS: int = 2
+    AUTH_HASH_QUEUE_LIMIT: int = 16
 
     # Customization
     FIRST_DAY_OF_WEEK: int = calendar.MONDAY
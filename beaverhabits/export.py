@@ -0,0 +1,102 @@
+import datetime
+import json
+import time
+import zlib
+from typing import AsyncIterator, Optional, Protocol
+
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
+
+from beaverhabits.conditional import check_not_modified, stamp_headers
+from beaverhabits.storage.dict import DictHabitList
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class Compressor(Protocol):
+    def compress(self, data: bytes) -> bytes: ...
+
+    def flush(self) -> bytes: ...
+
+
+def gzip_compressor() -> Compressor:
+    return zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+
+
+def zstd_compressor() -> Compressor:
+    return zstandard.ZstdCompressor().compressobj()  # type: ignore
+
+
+# Content codings by preference, zstd only with the optional zstandard package
+COMPRESSORS = {"gzip": gzip_compressor}
+if zstandard is not None:
+    COMPRESSORS = {"zstd": zstd_compressor, **COMPRESSORS}
+
+
+def accepted_encoding(accept_encoding: str) -> Optional[str]:
+    """Preferred supported coding of an Accept-Encoding header, None for identity"""
+    accepted = set()
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        q = params.strip().removeprefix("q=")
+        try:
+            if params and float(q) <= 0:
+                continue
+        except ValueError:
+            continue
+        accepted.add(coding.strip().lower())
+
+    return next((x for x in COMPRESSORS if x in accepted or "*" in accepted), None)
+
+
+async def export_chunks(
+    habit_list: DictHabitList, user_identify: str
+) -> AsyncIterator[bytes]:
+    """The exported document, encoded one habit at a time"""
+    head = {
+        "user_email": user_identify,
+        "exported_at": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        **{k: v for k, v in habit_list.data.items() if k != "habits"},
+    }
+    yield json.dumps(head)[:-1].encode() + b', "habits": ['
+
+    # Habits added or removed during the export are left out
+    for i, habit in enumerate(list(habit_list.data["habits"])):
+        yield (b", " if i else b"") + json.dumps(habit).encode()
+    yield b"]}"
+
+
+async def compress(
+    chunks: AsyncIterator[bytes], compressor: Compressor
+) -> AsyncIterator[bytes]:
+    async for chunk in chunks:
+        if data := compressor.compress(chunk):
+            yield data
+    yield compressor.flush()
+
+
+def export_response(
+    request: Request, habit_list: DictHabitList, user_identify: str
+) -> Response:
+    """Stream the habit list as a JSON download
+
+    Compressed when the client accepts it, and answered with 304 when the
+    client copy is still current.
+    """
+    stamp = habit_list.stamp
+    check_not_modified(request, stamp)
+
+    headers = {**stamp_headers(stamp), "Vary": "Accept-Encoding"}
+    file_name = f"habits_{int(time.time())}.json"
+    headers["Content-Disposition"] = f'attachment; filename="{file_name}"'
+
+    chunks = export_chunks(habit_list, user_identify)
+    coding = accepted_encoding(request.headers.get("accept-encoding", ""))
+    if coding is not None:
+        headers["Content-Encoding"] = coding
+        chunks = compress(chunks, COMPRESSORS[coding]())
+
+    return StreamingResponse(chunks, media_type="application/json", headers=headers)
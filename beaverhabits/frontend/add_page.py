@@ -1,3 +1,5 @@
+from typing import Callable
+
 from nicegui import ui
 
 from beaverhabits.frontend.components import (
@@ -5,34 +7,66 @@ from beaverhabits.frontend.components import (
     HabitDeleteButton,
     HabitNameInput,
     HabitStarCheckbox,
+    is_handling_event,
 )
 from beaverhabits.frontend.layout import layout
-from beaverhabits.storage.storage import HabitList
+from beaverhabits.storage.storage import ChangeKind, HabitList, HabitListChange
 
 grid_classes = "w-full gap-0 items-center"
 
 
-@ui.refreshable
-def add_ui(habit_list: HabitList):
+def add_ui(habit_list: HabitList, refresh: Callable):
     for item in habit_list.habits:
         with ui.grid(columns=9, rows=1).classes("w-full gap-0 items-center"):
             name = HabitNameInput(item)
             name.classes("col-span-7 break-all")
 
-            star = HabitStarCheckbox(item, add_ui.refresh)
+            star = HabitStarCheckbox(item, refresh)
             star.props("flat fab-mini color=grey")
             star.classes("col-span-1")
 
-            delete = HabitDeleteButton(item, habit_list, add_ui.refresh)
+            delete = HabitDeleteButton(item, habit_list, refresh)
             delete.props("flat fab-mini color=grey")
             delete.classes("col-span-1")
 
 
+class HabitEditList(ui.column):
+    """Editable habits of one page, rebuilt on changes from other pages
+
+    Changes made on this page refresh it explicitly, a rename in progress
+    must not rebuild its own input.
+    """
+
+    def __init__(self, habit_list: HabitList) -> None:
+        super().__init__()
+        self.habit_list = habit_list
+        self.classes("w-full items-center")
+        self.refresh()
+
+        habit_list.subscribe(self._on_change)
+
+    def refresh(self) -> None:
+        self.clear()
+        with self:
+            add_ui(self.habit_list, self.refresh)
+
+    def _on_change(self, change: HabitListChange) -> None:
+        if change.kind == ChangeKind.RELOAD:
+            with self:
+                ui.navigate.reload()
+        elif change.kind != ChangeKind.TICK and not is_handling_event(self.client):
+            self.refresh()
+
+    def _handle_delete(self) -> None:
+        self.habit_list.unsubscribe(self._on_change)
+        super()._handle_delete()
+
+
 def add_page_ui(habit_list: HabitList):
     with layout():
         with ui.column().classes("w-full pl-1 items-center"):
-            add_ui(habit_list)
+            edit_list = HabitEditList(habit_list)
 
             with ui.grid(columns=9, rows=1).classes("w-full gap-0 items-center"):
-                add = HabitAddButton(habit_list, add_ui.refresh)
+                add = HabitAddButton(habit_list, edit_list.refresh)
                 add.classes("col-span-7")
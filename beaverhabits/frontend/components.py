@@ -1,9 +1,10 @@
 import calendar
 import datetime
+import functools
 from dataclasses import dataclass
-from typing import Callable, Optional
+from typing import Callable, Optional, Sequence
 
-from nicegui import events, ui
+from nicegui import Client, events, ui
 from nicegui.elements.button import Button
 
 from beaverhabits.configs import settings
@@ -39,6 +40,14 @@ def menu_icon_button(icon_name: str, click: Optional[Callable] = None) -> Button
     return ui.button(icon=icon_name, color=None, on_click=click).props(button_props)
 
 
+def is_handling_event(client: Client) -> bool:
+    """Whether the running event handler belongs to a page of the client"""
+    try:
+        return ui.context.client is client
+    except RuntimeError:
+        return False
+
+
 class HabitCheckBox(ui.checkbox):
     def __init__(
         self,
@@ -53,6 +62,24 @@ class HabitCheckBox(ui.checkbox):
         self.day = day
         self._update_style(value)
 
+        habit.subscribe(self._on_tick)
+
+    def _on_tick(self, day: datetime.date, done: bool) -> None:
+        if day == self.day:
+            self.set_value(done)
+
+    def set_habit(self, habit: Habit) -> None:
+        """Follow the ticks of another wrapper of the habit"""
+        if habit is self.habit:
+            return
+        self.habit.unsubscribe(self._on_tick)
+        self.habit = habit
+        habit.subscribe(self._on_tick)
+
+    def _handle_delete(self) -> None:
+        self.habit.unsubscribe(self._on_tick)
+        super()._handle_delete()
+
     def _update_style(self, value: bool):
         self.props(
             f'checked-icon="{icons.DONE}" unchecked-icon="{icons.CLOSE}" keep-color'
@@ -64,6 +91,11 @@ class HabitCheckBox(ui.checkbox):
 
     async def _async_task(self, e: events.ValueChangeEventArguments):
         self._update_style(e.value)
+        # Value synced from storage, nothing to write
+        record = self.habit.get_record_by(self.day)
+        if (record.done if record else False) == e.value:
+            return
+
         # await asyncio.sleep(5)
         # ui.notify(f"Asynchronous task started: {self.record}")
         await self.habit.tick(self.day, e.value)
@@ -140,6 +172,7 @@ class HabitDateInput(ui.date):
         self.init = True
         self.default_date = today
         super().__init__(self.ticked_days, on_change=self._async_task)
+        self.selected = set(self.value) - {TODAY}
 
         self.props("multiple")
         self.props("minimal flat")
@@ -150,7 +183,7 @@ class HabitDateInput(ui.date):
         # self.props(f"subtitle='{habit.name}'")
         self.classes("shadow-none")
 
-        self.bind_value_from(self, "ticked_days")
+        habit.subscribe(self._on_tick)
 
     @property
     def ticked_days(self) -> list[str]:
@@ -159,49 +192,100 @@ class HabitDateInput(ui.date):
         result.append(TODAY)
         return result
 
+    def _on_tick(self, day: datetime.date, done: bool) -> None:
+        self.ticked_data[day] = done
+        key = day.strftime(DAY_MASK)
+        if (key in self.selected) != done:
+            self.selected.symmetric_difference_update({key})
+            self.set_value([*self.selected, TODAY])
+
+    def _handle_delete(self) -> None:
+        self.habit.unsubscribe(self._on_tick)
+        super()._handle_delete()
+
     async def _async_task(self, e: events.ValueChangeEventArguments):
-        old_values = set(self.habit.ticked_days)
-        new_values = set(strptime(x, DAY_MASK).date() for x in e.value if x != TODAY)
+        # Diff the date strings, only changed days are parsed
+        selected = set(e.value) - {TODAY}
+        added, removed = selected - self.selected, self.selected - selected
+        self.selected = selected
 
-        for day in new_values - old_values:
-            # self.props(remove="default-date")
-            self.props(f"default-year-month={day.strftime(MONTH_MASK)}")
-            self.ticked_data[day] = True
+        changes = {strptime(x, DAY_MASK).date(): True for x in added}
+        changes.update({strptime(x, DAY_MASK).date(): False for x in removed})
+        if not changes:
+            return
 
-            await self.habit.tick(day, True)
-            logger.info(f"QDate day {day} ticked: True")
+        # Update state data first, ticks are pushed back to this input
+        self.ticked_data.update(changes)
+        day = max(changes)
+        self.props(f"default-year-month={day.strftime(MONTH_MASK)}")
 
-        for day in old_values - new_values:
-            # self.props(remove="default-date")
-            self.props(f"default-year-month={day.strftime(MONTH_MASK)}")
-            self.ticked_data[day] = False
+        await self.habit.tick_many(changes)
+        logger.info(f"QDate days ticked: {changes}")
 
-            await self.habit.tick(day, False)
-            logger.info(f"QDate day {day} ticked: False")
 
+# Calendars kept by CalendarHeatmap.build and build_range
+CALENDAR_CACHE_SIZE = 128
 
-@dataclass
+
+@dataclass(frozen=True)
 class CalendarHeatmap:
-    """Habit records by weeks"""
+    """Habit records by weeks
+
+    Calendars are immutable and memoized, pages of all users share them.
+    """
 
     today: datetime.date
     month_last_day: datetime.date
 
-    headers: list[str]
-    data: list[list[datetime.date]]
-    week_days: list[str]
+    headers: tuple[str, ...]
+    data: tuple[tuple[datetime.date, ...], ...]
+    week_days: tuple[str, ...]
 
     @classmethod
+    @functools.lru_cache(maxsize=CALENDAR_CACHE_SIZE)
     def build(
         cls, today: datetime.date, weeks: int, firstweekday: int = calendar.MONDAY
-    ):
+    ) -> "CalendarHeatmap":
         month_last_day = cls.get_month_last_day(today)
-
         data = cls.generate_calendar_days(today, weeks, firstweekday)
+        return cls._build(today, month_last_day, data, firstweekday)
+
+    @classmethod
+    @functools.lru_cache(maxsize=CALENDAR_CACHE_SIZE)
+    def build_range(
+        cls,
+        start: datetime.date,
+        end: datetime.date,
+        firstweekday: int = calendar.MONDAY,
+    ) -> "CalendarHeatmap":
+        """Calendar of whole weeks from start to end, e.g. over several years"""
+        first_date_of_calendar = start - datetime.timedelta(
+            days=(start.weekday() - firstweekday) % 7
+        )
+        last_date_of_calendar = cls.get_week_last_day(end, firstweekday)
+        weeks = ((last_date_of_calendar - first_date_of_calendar).days + 1) // 7
+
+        data = cls.generate_weeks(last_date_of_calendar, weeks)
+        return cls._build(end, end, data, firstweekday)
+
+    @classmethod
+    def _build(
+        cls,
+        today: datetime.date,
+        month_last_day: datetime.date,
+        data: list[list[datetime.date]],
+        firstweekday: int,
+    ) -> "CalendarHeatmap":
         headers = cls.generate_calendar_headers(data[0])
         week_day_abbr = [calendar.day_abbr[(firstweekday + i) % 7] for i in range(7)]
 
-        return cls(today, month_last_day, headers, data, week_day_abbr)
+        return cls(
+            today,
+            month_last_day,
+            tuple(headers),
+            tuple(tuple(days) for days in data),
+            tuple(week_day_abbr),
+        )
 
     @staticmethod
     def get_month_last_day(today: datetime.date) -> datetime.date:
@@ -209,7 +293,15 @@ class CalendarHeatmap:
         return datetime.date(today.year, today.month, month_days)
 
     @staticmethod
-    def generate_calendar_headers(days: list[datetime.date]) -> list[str]:
+    def get_week_last_day(
+        day: datetime.date, firstweekday: int = calendar.MONDAY
+    ) -> datetime.date:
+        lastweekday = (firstweekday - 1) % 7
+        days_delta = (lastweekday - day.weekday()) % 7
+        return day + datetime.timedelta(days=days_delta)
+
+    @staticmethod
+    def generate_calendar_headers(days: Sequence[datetime.date]) -> list[str]:
         if not days:
             return []
 
@@ -239,10 +331,15 @@ class CalendarHeatmap:
         last_date_of_month = CalendarHeatmap.get_month_last_day(today)
 
         # Then find the last day of the week
-        lastweekday = (firstweekday - 1) % 7
-        days_delta = (lastweekday - last_date_of_month.weekday()) % 7
-        last_date_of_calendar = last_date_of_month + datetime.timedelta(days=days_delta)
+        last_date_of_calendar = CalendarHeatmap.get_week_last_day(
+            last_date_of_month, firstweekday
+        )
+        return CalendarHeatmap.generate_weeks(last_date_of_calendar, total_weeks)
 
+    @staticmethod
+    def generate_weeks(
+        last_date_of_calendar: datetime.date, total_weeks: int
+    ) -> list[list[datetime.date]]:
         return [
             [
                 last_date_of_calendar - datetime.timedelta(days=i, weeks=j)
@@ -269,28 +366,33 @@ class CalendarCheckBox(ui.checkbox):
 
         self.classes("inline-block")
         self.props("dense")
-        unchecked_icon, checked_icon = self._icon_svg()
-        self.props(f'unchecked-icon="{unchecked_icon}"')
-        self.props(f'checked-icon="{checked_icon}"')
+        self.props(f'unchecked-icon="{icons.SQUARE_ICONS[day.day, False]}"')
+        self.props(f'checked-icon="{icons.SQUARE_ICONS[day.day, True]}"')
 
         if is_bind_data:
-            self.bind_value_from(self, "ticked")
+            habit.subscribe(self._on_tick)
 
     @property
     def ticked(self):
         return self.ticked_data.get(self.day, False)
 
-    def _icon_svg(self):
-        unchecked_color, checked_color = "rgb(54,54,54)", "rgb(103,150,207)"
-        return (
-            icons.SQUARE.format(color=unchecked_color, text=self.day.day),
-            icons.SQUARE.format(color=checked_color, text=self.day.day),
-        )
+    def _on_tick(self, day: datetime.date, done: bool) -> None:
+        if day == self.day:
+            self.set_value(done)
+
+    def _handle_delete(self) -> None:
+        self.habit.unsubscribe(self._on_tick)
+        super()._handle_delete()
 
     async def _async_task(self, e: events.ValueChangeEventArguments):
         # Update state data
         self.ticked_data[self.day] = e.value
 
+        # Value pushed from storage, nothing to write
+        record = self.habit.get_record_by(self.day)
+        if (record.done if record else False) == e.value:
+            return
+
         # Update persistent storage
         await self.habit.tick(self.day, e.value)
         logger.info(f"Calendar Day {self.day} ticked: {e.value}")
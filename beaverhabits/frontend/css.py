@@ -1,3 +1,5 @@
+from beaverhabits.frontend import icons
+
 # Solve the problem of the checkbox hover effect hide by other checkboxes
 # https://github.com/zauberzeug/nicegui/blob/b4bc24bae3d965e0b58e21d9026ec66ba28ae64d/nicegui/static/quasar.css#L1087
 CHECK_BOX_CSS = """
@@ -27,3 +29,25 @@ CALENDAR_CSS = """
     min-height: 0;
 }
 """
+
+# Day squares of the calendar heatmap, one background per state and one
+# label per day of month
+SQUARE_ICON_CSS = "\n".join(
+    [
+        f"""
+.q-icon.icon-square {{
+    background: center / 100% no-repeat url("{icons.SQUARE.format(color=icons.unchecked_square_color)}");
+    color: white;
+}}
+.q-icon.icon-square.square-done {{
+    background-image: url("{icons.SQUARE.format(color=icons.current_color)}");
+}}
+.q-icon.icon-square::before {{
+    font-family: Roboto, -apple-system, Helvetica Neue, Helvetica, Arial, sans-serif;
+    font-size: 0.4em;
+    font-weight: 300;
+}}
+""",
+        *(f'.square-{day}::before {{ content: "{day}"; }}' for day in range(1, 32)),
+    ]
+)
@@ -10,7 +10,7 @@ from beaverhabits.frontend.components import (
     habit_heat_map,
     link,
 )
-from beaverhabits.frontend.css import CALENDAR_CSS, CHECK_BOX_CSS
+from beaverhabits.frontend.css import CALENDAR_CSS, CHECK_BOX_CSS, SQUARE_ICON_CSS
 from beaverhabits.frontend.layout import layout
 from beaverhabits.storage.meta import get_habit_heatmap_path
 from beaverhabits.storage.storage import Habit
@@ -42,6 +42,7 @@ def habit_page(today: datetime.date, habit: Habit):
 def habit_page_ui(today: datetime.date, habit: Habit):
     ui.add_css(CHECK_BOX_CSS)
     ui.add_css(CALENDAR_CSS)
+    ui.add_css(SQUARE_ICON_CSS)
 
     with layout(title=habit.name):
         habit_page(today, habit)
@@ -0,0 +1,111 @@
+// Calendar heatmap of one habit, rendered from the calendar layout and the
+// ticked days as offsets from the first calendar day (`start`).
+// Toggles are sent back in batches as a list of [offset, done] pairs.
+export default {
+  template: `
+    <div>
+      <div class="row no-wrap" style="gap: 0">
+        <div
+          v-for="(header, j) in headers"
+          :key="j"
+          class="text-gray-300 text-center"
+          style="width: 20px; line-height: 18px; font-size: 9px"
+        >{{ header }}</div>
+        <div style="width: 22px"></div>
+      </div>
+      <div v-for="(weekDay, i) in weekDays" :key="weekDay" class="row no-wrap" style="gap: 0">
+        <template v-for="j in weeks" :key="j">
+          <svg
+            v-if="offset(i, j - 1) <= last"
+            viewBox="0 0 20 20"
+            width="20"
+            height="20"
+            style="cursor: pointer"
+            @click="toggle(offset(i, j - 1))"
+          >
+            <rect
+              x="1"
+              y="1"
+              width="18"
+              height="18"
+              rx="2.5"
+              :fill="done.has(offset(i, j - 1)) ? checkedColor : uncheckedColor"
+            />
+            <text
+              x="10"
+              y="10"
+              text-anchor="middle"
+              dominant-baseline="central"
+              fill="white"
+              font-size="8"
+              class="font-light"
+              style="font-family: Roboto, -apple-system, Helvetica Neue, Helvetica, Arial, sans-serif"
+            >{{ dayOfMonth(offset(i, j - 1)) }}</text>
+          </svg>
+          <div v-else style="width: 20px; height: 20px"></div>
+        </template>
+        <div
+          class="indent-1.5 text-gray-300"
+          style="width: 22px; line-height: 20px; font-size: 9px"
+        >{{ weekDay }}</div>
+      </div>
+    </div>
+  `,
+  props: {
+    start: String,
+    weeks: Number,
+    last: Number,
+    headers: Array,
+    weekDays: Array,
+    ticked: Array,
+    batchMs: Number,
+    checkedColor: String,
+    uncheckedColor: String,
+  },
+  data() {
+    return {
+      done: new Set(this.ticked),
+      pending: new Map(),
+      timer: null,
+    };
+  },
+  computed: {
+    startTime() {
+      return Date.parse(this.start + "T00:00:00Z");
+    },
+  },
+  watch: {
+    ticked(value) {
+      this.done = new Set(value);
+      // Local toggles not sent yet win over the server state
+      for (const [offset, done] of this.pending) {
+        done ? this.done.add(offset) : this.done.delete(offset);
+      }
+    },
+  },
+  unmounted() {
+    this.flush();
+  },
+  methods: {
+    offset(weekDay, week) {
+      return week * 7 + weekDay;
+    },
+    dayOfMonth(offset) {
+      return new Date(this.startTime + offset * 86400000).getUTCDate();
+    },
+    toggle(offset) {
+      const done = !this.done.has(offset);
+      done ? this.done.add(offset) : this.done.delete(offset);
+      this.pending.set(offset, done);
+
+      clearTimeout(this.timer);
+      this.timer = setTimeout(this.flush, this.batchMs);
+    },
+    flush() {
+      clearTimeout(this.timer);
+      if (this.pending.size === 0) return;
+      this.$emit("ticks", Array.from(this.pending));
+      this.pending.clear();
+    },
+  },
+};
@@ -0,0 +1,80 @@
+import datetime
+
+from nicegui import events
+from nicegui.element import Element
+
+from beaverhabits.frontend import icons
+from beaverhabits.frontend.components import CalendarHeatmap
+from beaverhabits.logging import logger
+from beaverhabits.storage.storage import Habit
+
+# Quiet time before toggles are sent to the server
+BATCH_MS = 300
+
+
+class HabitHeatmap(Element, component="heatmap.js"):
+    """Calendar heatmap rendered on the client as a single element
+
+    The page ships the calendar layout and the ticked days as offsets from
+    the first calendar day. Toggles come back in batches.
+    """
+
+    def __init__(self, habit: Habit, habit_calendar: CalendarHeatmap) -> None:
+        super().__init__()
+        self.habit = habit
+        self.start = habit_calendar.data[0][0]
+        self.last_day = habit_calendar.month_last_day
+
+        self._props["start"] = self.start.isoformat()
+        self._props["weeks"] = len(habit_calendar.data[0])
+        self._props["last"] = (self.last_day - self.start).days
+        self._props["headers"] = habit_calendar.headers
+        self._props["weekDays"] = habit_calendar.week_days
+        self._props["batchMs"] = BATCH_MS
+        self._props["checkedColor"] = icons.current_color
+        self._props["uncheckedColor"] = icons.unchecked_square_color
+        self._props["ticked"] = self._ticked_offsets()
+
+        self.on("ticks", self._async_task)
+        self._ticking = False
+        habit.subscribe(self._on_tick)
+
+    def _ticked_offsets(self) -> list[int]:
+        records = self.habit.get_records_between(self.start, self.last_day)
+        return [(r.day - self.start).days for r in records if r.done]
+
+    def refresh(self) -> None:
+        """Push the stored ticked days to the client"""
+        self._props["ticked"] = self._ticked_offsets()
+        self.update()
+
+    def _on_tick(self, day: datetime.date, done: bool) -> None:
+        if not self._ticking and self.start <= day <= self.last_day:
+            self.refresh()
+
+    def _handle_delete(self) -> None:
+        self.habit.unsubscribe(self._on_tick)
+        super()._handle_delete()
+
+    async def _async_task(self, e: events.GenericEventArguments):
+        # Sent by the client, expected as [[offset, done], ...]
+        items = e.args if isinstance(e.args, list) else []
+        last = self._props["last"]
+        changes = {
+            self.start + datetime.timedelta(days=item[0]): item[1]
+            for item in items
+            if isinstance(item, list)
+            and len(item) == 2
+            and isinstance(item[0], int)
+            and isinstance(item[1], bool)
+            and 0 <= item[0] <= last
+        }
+        self._ticking = True
+        try:
+            await self.habit.tick_many(changes)
+            logger.info(f"Heatmap days ticked: {changes}")
+        finally:
+            self._ticking = False
+
+        # Keep the state sent on reconnect up to date, the client has it already
+        self._props["ticked"] = self._ticked_offsets()
@@ -15,14 +15,13 @@ STAR = SVG_TEMPLATE.format(height="24", color="rgb(158,158,158)", data="m305-704
 STAR_FULL = SVG_TEMPLATE.format(height="24", color="rgb(158,158,158)", data="m305-704 112-145q12-16 28.5-23.5T480-880q18 0 34.5 7.5T543-849l112 145 170 57q26 8 41 29.5t15 47.5q0 12-3.5 24T866-523L756-367l4 164q1 35-23 59t-56 24q-2 0-22-3l-179-50-179 50q-5 2-11 2.5t-11 .5q-32 0-56-24t-23-59l4-165L95-523q-8-11-11.5-23T80-570q0-25 14.5-46.5T135-647l170-57Z")
 
 SQUARE_TODAY_CIRCLE = "<circle cx='10' cy='10' r='7' fill='none' stroke='white' stroke-width='0.5' opacity='0.3'/>"
-SQUARE = """\
-img:data:image/svg+xml;charset=utf8,\
-<svg viewBox='0 0 20 20' xmlns='http://www.w3.org/2000/svg'>\
-    <rect x='1' y='1' width='18' height='18' rx='2.5' fill='{color}'/>\
-    <text x='10' text-anchor='middle' y='10' dominant-baseline='central' fill='white' font-size='8' \
-        style='font-family: Roboto,-apple-system,Helvetica Neue,Helvetica,Arial,sans-serif;'\
-        class='font-light'\
-    >{text}</text>\
-</svg>\
-"""
+SQUARE = "data:image/svg+xml;charset=utf8,<svg viewBox='0 0 20 20' xmlns='http://www.w3.org/2000/svg'><rect x='1' y='1' width='18' height='18' rx='2.5' fill='{color}'/></svg>"
 # fmt: on
+
+# Calendar day squares as class based icons, see css.SQUARE_ICON_CSS.
+# Quasar passes icon names starting with "icon-" through as classes.
+SQUARE_ICONS = {
+    (day, done): f"icon-square square-{day}" + (" square-done" if done else "")
+    for day in range(1, 32)
+    for done in (False, True)
+}
@@ -1,48 +1,41 @@
-import json
 import logging
+import os
+from typing import BinaryIO
 
-from nicegui import events, ui
+from nicegui import background_tasks, events, ui
 
 from beaverhabits.app.db import User
+from beaverhabits.configs import settings
 from beaverhabits.frontend.components import menu_header
+from beaverhabits.importer import ImportJob, InvalidImport
 from beaverhabits.storage.dict import DictHabitList
 from beaverhabits.storage.meta import get_root_path
-from beaverhabits.storage.storage import HabitList
 from beaverhabits.views import user_storage
 
 
-async def import_from_json(text: str) -> HabitList:
-    habit_list = DictHabitList(json.loads(text))
-    if not habit_list.habits:
-        raise ValueError("No habits found")
-    return habit_list
-
-
 def import_ui_page(user: User):
-    async def handle_upload(e: events.UploadEventArguments):
+    async def import_file(file: BinaryIO, size: int) -> None:
+        progress.set_value(0)
+        progress.set_visibility(True)
         try:
-            text = e.content.read().decode("utf-8")
-            other = await import_from_json(text)
+            job = ImportJob(file, size, on_progress=progress.set_value)
+            other = await job.parse()
 
             from_habit_list = await user_storage.get_user_habit_list(user)
             if not from_habit_list:
-                added = other.habits
-                merged = set()
-                unchanged = set()
-            else:
-                added = set(other.habits) - set(from_habit_list.habits)
-                merged = set(other.habits) & set(from_habit_list.habits)
-                unchanged = set(from_habit_list.habits) - set(other.habits)
+                from_habit_list = DictHabitList({"habits": []})
+            stamp = from_habit_list.stamp
+            to_habit_list, stats = await from_habit_list.merge_stream(other.habits)
 
-            logging.info(f"added: {added}")
-            logging.info(f"merged: {merged}")
-            logging.info(f"unchanged: {unchanged}")
+            logging.info(f"added: {stats.added}")
+            logging.info(f"merged: {stats.merged}")
+            logging.info(f"unchanged: {stats.unchanged}")
 
             with ui.dialog() as dialog, ui.card().classes("w-64"):
                 ui.label(
                     "Are you sure? "
-                    + f"{len(added)} habits will be added and "
-                    + f"{len(merged)} habits will be merged.",
+                    + f"{stats.added} habits will be added and "
+                    + f"{stats.merged} habits will be merged.",
                 )
                 with ui.row():
                     ui.button("Yes", on_click=lambda: dialog.submit("Yes"))
@@ -52,21 +45,47 @@ def import_ui_page(user: User):
             if result != "Yes":
                 return
 
-            to_habit_list = await user_storage.merge_user_habit_list(user, other)
+            # Changed while the dialog was open
+            if from_habit_list.stamp != stamp:
+                to_habit_list, stats = await from_habit_list.merge_stream(other.habits)
             await user_storage.save_user_habit_list(user, to_habit_list)
             ui.notify(
-                f"Imported {len(added) + len(merged)} habits",
+                f"Imported {stats.added + stats.merged} habits",
                 position="top",
                 color="positive",
             )
-        except json.JSONDecodeError:
-            ui.notify("Import failed: Invalid JSON", color="negative", position="top")
+        except InvalidImport as error:
+            ui.notify(f"Import failed: {error}", color="negative", position="top")
         except Exception as error:
             logging.exception("Import failed")
             ui.notify(str(error), color="negative", position="top")
+        finally:
+            progress.set_visibility(False)
+            upload.reset()
+
+    async def run_import(file: BinaryIO, size: int) -> None:
+        # Background tasks have no page context of their own
+        with container:
+            await import_file(file, size)
+
+    def handle_upload(e: events.UploadEventArguments):
+        size = e.content.seek(0, os.SEEK_END)
+        e.content.seek(0)
+        background_tasks.create(run_import(e.content, size), name=f"import-{user.id}")
+
+    def handle_rejected():
+        limit = settings.IMPORT_MAX_BYTES
+        ui.notify(f"File too large, the limit is {limit} bytes", color="negative")
 
     menu_header("Import", target=get_root_path())
 
-    # Upload: https://nicegui.io/documentation/upload
-    ui.upload(on_upload=handle_upload, max_files=1).props("accept=.json")
-    return
+    with ui.column().classes("w-full") as container:
+        # Upload: https://nicegui.io/documentation/upload
+        upload = ui.upload(
+            on_upload=handle_upload,
+            on_rejected=handle_rejected,
+            max_files=1,
+            max_file_size=settings.IMPORT_MAX_BYTES,
+        ).props("accept=.json")
+        progress = ui.linear_progress(value=0, show_value=False)
+        progress.set_visibility(False)
@@ -8,50 +8,126 @@ from beaverhabits.configs import settings
 from beaverhabits.frontend.components import HabitCheckBox, link
 from beaverhabits.frontend.layout import layout
 from beaverhabits.storage.meta import get_root_path
-from beaverhabits.storage.storage import HabitList
+from beaverhabits.storage.storage import ChangeKind, Habit, HabitList, HabitListChange
 
 HABIT_LIST_RECORD_COUNT = settings.INDEX_HABIT_ITEM_COUNT
 
 row_compat_classes = "pl-4 pr-1 py-0"
 
+# align center vertically
+grid_classes = "w-full gap-0 items-center"
+left_classes, right_classes = (
+    # grid 5
+    "col-span-5 break-all",
+    # grid 2 2 2 2 2
+    "col-span-2 px-1.5 justify-self-center",
+)
 
-@ui.refreshable
-def habit_list_ui(days: List[datetime.date], habits: HabitList):
-    if not habits.habits:
-        ui.label("List is empty.").classes("mx-auto")
-        return
-
-    with ui.column().classes("gap-1.5"):
-        # align center vertically
-        grid_classes = "w-full gap-0 items-center"
-        grid = lambda rows: ui.grid(columns=15, rows=rows).classes(grid_classes)
-        left_classes, right_classes = (
-            # grid 5
-            "col-span-5 break-all",
-            # grid 2 2 2 2 2
-            "col-span-2 px-1.5 justify-self-center",
-        )
-
-        with grid(2).classes(row_compat_classes):
-            for fmt in ("%a", "%d"):
-                ui.label("").classes(left_classes)
-                for date in days:
-                    label = ui.label(str(date.strftime(fmt))).classes(right_classes)
-                    label.style("color: #9e9e9e; font-size: 85%; font-weight: 500")
-
-        for habit in habits.habits:
-            with ui.card().classes(row_compat_classes).classes("shadow-none"):
-                with grid(1):
-                    redirect_page = os.path.join(get_root_path(), "habits", habit.id)
-                    habit_name = link(habit.name, target=redirect_page)
-                    habit_name.classes(left_classes)
-
-                    d_d = {r.day: r.done for r in habit.records}
-                    for day in days:
-                        checkbox = HabitCheckBox(habit, day, value=d_d.get(day, False))
-                        checkbox.classes(right_classes)
+
+def grid(rows: int) -> ui.grid:
+    return ui.grid(columns=15, rows=rows).classes(grid_classes)
+
+
+class HabitRow(ui.card):
+    """One habit of the grid, updated in place"""
+
+    def __init__(self, habit: Habit, days: List[datetime.date]) -> None:
+        super().__init__()
+        self.habit = habit
+        self.days = days
+        self.classes(row_compat_classes).classes("shadow-none")
+
+        ticked = self.ticked_data()
+        with self, grid(1):
+            redirect_page = os.path.join(get_root_path(), "habits", habit.id)
+            self.habit_name = link(habit.name, target=redirect_page)
+            self.habit_name.classes(left_classes)
+
+            self.checkboxes = []
+            for day in days:
+                checkbox = HabitCheckBox(habit, day, value=ticked.get(day, False))
+                checkbox.classes(right_classes)
+                self.checkboxes.append(checkbox)
+
+    def ticked_data(self) -> dict[datetime.date, bool]:
+        # Looked up day by day in the loaded records, the table storage
+        # included, no query is made per row
+        records = self.habit.get_records_between(min(self.days), max(self.days))
+        return {r.day: r.done for r in records}
+
+    def update_from(self, habit: Habit) -> None:
+        self.habit = habit
+        self.habit_name.set_text(habit.name)
+
+        ticked = self.ticked_data()
+        for checkbox in self.checkboxes:
+            checkbox.set_habit(habit)
+            checkbox.set_value(ticked.get(checkbox.day, False))
+
+
+class HabitListUI(ui.column):
+    """Habit grid with one row per habit id
+
+    `refresh` adds, removes, moves and updates rows in place instead of
+    rebuilding the grid. It runs on every change of the habit list made
+    elsewhere, e.g. in another tab of the same user.
+    """
+
+    def __init__(self, days: List[datetime.date], habits: HabitList) -> None:
+        super().__init__()
+        self.days = days
+        self.habits = habits
+        self.rows: dict[str, HabitRow] = {}
+        self.classes("gap-1.5")
+
+        with self:
+            self.empty = ui.label("List is empty.").classes("mx-auto")
+            with grid(2).classes(row_compat_classes) as self.header:
+                for fmt in ("%a", "%d"):
+                    ui.label("").classes(left_classes)
+                    for date in days:
+                        label = ui.label(str(date.strftime(fmt)))
+                        label.classes(right_classes)
+                        label.style("color: #9e9e9e; font-size: 85%; font-weight: 500")
+
+        self.refresh()
+
+        habits.subscribe(self._on_change)
+
+    def _on_change(self, change: HabitListChange) -> None:
+        # Ticks are pushed to the check boxes by their habits
+        if change.kind == ChangeKind.RELOAD:
+            with self:
+                ui.navigate.reload()
+        elif change.kind != ChangeKind.TICK:
+            self.refresh()
+
+    def _handle_delete(self) -> None:
+        self.habits.unsubscribe(self._on_change)
+        super()._handle_delete()
+
+    def refresh(self) -> None:
+        habits = self.habits.habits
+        self.empty.set_visibility(not habits)
+        self.header.set_visibility(bool(habits))
+
+        ids = {str(habit.id) for habit in habits}
+        for habit_id in [x for x in self.rows if x not in ids]:
+            self.remove(self.rows.pop(habit_id))
+
+        # Rows follow the empty label and the header
+        children = self.default_slot.children
+        for i, habit in enumerate(habits, start=2):
+            row = self.rows.get(str(habit.id))
+            if row is None:
+                with self:
+                    row = self.rows[str(habit.id)] = HabitRow(habit, self.days)
+            else:
+                row.update_from(habit)
+            if children.index(row) != i:
+                row.move(self, target_index=i)
 
 
 def index_page_ui(days: List[datetime.date], habits: HabitList):
     with layout():
-        habit_list_ui(days, habits)
+        HabitListUI(days, habits)
@@ -0,0 +1,255 @@
+import asyncio
+import codecs
+import datetime
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Any, BinaryIO, Callable, Optional
+
+from beaverhabits.configs import settings
+from beaverhabits.storage.bitset import Bitset
+from beaverhabits.storage.dict import (
+    BITSET_KEY,
+    DAY_MASK,
+    UNCHECKED_KEY,
+    DictHabit,
+    DictHabitList,
+)
+
+IMPORT_CHUNK_SIZE = 64 * 1024
+
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+# Numbers and literals, possibly cut by the end of the chunk
+SCALAR_TAIL = re.compile(r"[-+.0-9a-zA-Z]*")
+STRING = re.compile(r'"(?:[^"\\]|\\.)*+"')
+# Skips other chars and whole strings up to the next bracket, or up to the
+# quote of a string cut by the end of the chunk
+STRUCTURE = re.compile(rf'(?:[^"{{}}\[\]]++|{STRING.pattern})*+([{{}}\[\]"])')
+STRING_END = re.compile(r'["\\]')
+
+# Parser states, within {"...": ..., "habits": [{...}, ...]}
+START, FIRST_KEY, KEY, COLON, VALUE, AFTER_VALUE = range(6)
+FIRST_ITEM, ITEM, AFTER_ITEM, END = range(6, 10)
+
+TRANSITIONS = {
+    (START, "{"): FIRST_KEY,
+    (FIRST_KEY, "}"): END,
+    (COLON, ":"): VALUE,
+    (AFTER_VALUE, ","): KEY,
+    (AFTER_VALUE, "}"): END,
+    (FIRST_ITEM, "]"): AFTER_VALUE,
+    (AFTER_ITEM, ","): ITEM,
+    (AFTER_ITEM, "]"): AFTER_VALUE,
+}
+
+
+class InvalidImport(ValueError):
+    pass
+
+
+class HabitStreamParser:
+    """Incremental parser of the habits of an exported habit list
+
+    Fed with text chunks, it returns the habits completed by each chunk.
+    Other top-level values are decoded and dropped, so only one habit at a
+    time is buffered. A value is decoded once its end is in the buffer, so
+    a habit spanning many chunks is still parsed in linear time, and
+    malformed input is reported as soon as the value is complete.
+    """
+
+    def __init__(self) -> None:
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.offset = 0
+        self.state = START
+        self.key: Optional[str] = None
+        self.final = False
+
+        # Chunks of the value being scanned, joined once it is complete
+        self.parts: Optional[list[str]] = None
+        self.value_end: Optional[int] = None
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+
+    def feed(self, text: str) -> list[Any]:
+        if self.parts is not None:
+            end = self._scan(text, 0)
+            self.parts.append(text)
+            if end is None:
+                return []
+            self.buffer, self.parts = "".join(self.parts), None
+            self.value_end = len(self.buffer) - len(text) + end
+        else:
+            self.offset += self.pos
+            self.buffer = self.buffer[self.pos :] + text
+            self.pos = 0
+
+        habits: list[Any] = []
+        while self._step(habits):
+            pass
+        return habits
+
+    def close(self) -> list[Any]:
+        self.final = True
+        habits = self.feed("")
+        if self.state != END:
+            raise InvalidImport("Invalid JSON: unexpected end of file")
+        return habits
+
+    def _error(self, message: str) -> InvalidImport:
+        return InvalidImport(
+            f"Invalid JSON: {message} at char {self.offset + self.pos}"
+        )
+
+    def _scan(self, text: str, i: int) -> Optional[int]:
+        """End in `text` of the string, object or array being scanned
+
+        Only strings and brackets are looked at, and the scan goes on from
+        where the previous chunk ended, so every char is scanned once.
+        """
+        while i < len(text):
+            if self.escaped:
+                self.escaped, i = False, i + 1
+                continue
+            if self.in_string:
+                if (m := STRING_END.search(text, i)) is None:
+                    return None
+                i = m.end()
+                if m.group() == "\\":
+                    self.escaped = True
+                    continue
+                self.in_string = False
+            else:
+                if (m := STRUCTURE.match(text, i)) is None:
+                    return None
+                i, token = m.end(), m.group(1)
+                if token == '"':
+                    self.in_string = True
+                    continue
+                if token in "{[":
+                    self.depth += 1
+                elif token in "}]":
+                    self.depth -= 1
+            if self.depth == 0:
+                return i
+        return None
+
+    def _step(self, habits: list[Any]) -> bool:
+        self.pos = WHITESPACE.match(self.buffer, self.pos).end()  # type: ignore
+        if self.pos == len(self.buffer):
+            return False
+
+        c = self.buffer[self.pos]
+        if self.state == END:
+            raise self._error("extra data")
+        if self.state == VALUE and self.key == "habits":
+            if c != "[":
+                raise InvalidImport("Invalid habits: expected a list")
+            self.pos += 1
+            self.state = FIRST_ITEM
+            return True
+        if (state := TRANSITIONS.get((self.state, c))) is not None:
+            self.pos += 1
+            self.state = state
+            return True
+        if self.state in (FIRST_KEY, KEY) and c != '"':
+            raise self._error("expected a key")
+        if self.state not in (FIRST_KEY, KEY, VALUE, FIRST_ITEM, ITEM):
+            raise self._error(f"unexpected {c!r}")
+
+        end, self.value_end = self.value_end, None
+        if end is None and c == '"' and (m := STRING.match(self.buffer, self.pos)):
+            end = m.end()
+        if end is None and c in '{["':
+            if (end := self._scan(self.buffer, self.pos)) is None:
+                # Kept aside until the value ends in a later chunk
+                self.offset += self.pos
+                self.parts, self.buffer, self.pos = [self.buffer[self.pos :]], "", 0
+                return False
+        elif end is None and not self.final:
+            # Numbers and literals may go on in the next chunk
+            if SCALAR_TAIL.match(self.buffer, self.pos).end() == len(self.buffer):  # type: ignore
+                return False
+
+        try:
+            value, decoded = self.decoder.raw_decode(self.buffer, self.pos)
+        except json.JSONDecodeError as e:
+            self.pos = e.pos
+            raise self._error(e.msg)
+        if end is not None and decoded != end:
+            raise self._error("unexpected bracket")
+        self.pos = decoded
+
+        if self.state in (FIRST_KEY, KEY):
+            self.key, self.state = value, COLON
+        elif self.state == VALUE:
+            self.state = AFTER_VALUE
+        else:
+            habits.append(value)
+            self.state = AFTER_ITEM
+        return True
+
+
+def validate_habit(d: Any) -> DictHabit:
+    if not isinstance(d, dict) or not isinstance(d.get("name"), str):
+        raise InvalidImport("Invalid habit: a name is required")
+    name = d["name"]
+    if not isinstance(d.get("id", ""), str):
+        raise InvalidImport(f"Invalid habit {name}: id must be a string")
+
+    try:
+        if BITSET_KEY in d:
+            Bitset.decode(d[BITSET_KEY])
+            if UNCHECKED_KEY in d:
+                Bitset.decode(d[UNCHECKED_KEY])
+            return DictHabit(d)
+
+        records = d.setdefault("records", [])
+        for r in records:
+            datetime.datetime.strptime(r["day"], DAY_MASK)
+            if not isinstance(r["done"], bool):
+                raise TypeError("done must be a boolean")
+    except (TypeError, ValueError, KeyError, AttributeError) as e:
+        raise InvalidImport(f"Invalid records of habit {name}: {e}") from e
+    return DictHabit(d)
+
+
+@dataclass
+class ImportJob:
+    """Parse an uploaded habit list chunk by chunk
+
+    Each chunk is read and parsed in a thread, so the event loop stays
+    responsive. `on_progress` gets the parsed fraction.
+    """
+
+    file: BinaryIO
+    size: int
+    on_progress: Optional[Callable[[float], None]] = None
+    habits: list[DictHabit] = field(default_factory=list)
+
+    async def parse(self) -> DictHabitList:
+        if self.size > settings.IMPORT_MAX_BYTES:
+            raise InvalidImport(
+                f"File too large, the limit is {settings.IMPORT_MAX_BYTES} bytes"
+            )
+
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        parser = HabitStreamParser()
+        read = 0
+        while chunk := await asyncio.to_thread(self.file.read, IMPORT_CHUNK_SIZE):
+            read += len(chunk)
+            if read > settings.IMPORT_MAX_BYTES:
+                raise InvalidImport("File too large")
+
+            habits = await asyncio.to_thread(parser.feed, decoder.decode(chunk))
+            self.habits.extend(map(validate_habit, habits))
+            if self.on_progress is not None:
+                self.on_progress(min(read / (self.size or 1), 1))
+
+        self.habits.extend(map(validate_habit, parser.feed(decoder.decode(b"", True))))
+        self.habits.extend(map(validate_habit, parser.close()))
+        if not self.habits:
+            raise InvalidImport("No habits found")
+        return DictHabitList({"habits": [h.data for h in self.habits]})
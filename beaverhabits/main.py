@@ -4,11 +4,13 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 
+from .app.api import init_api_routes
 from .app.app import init_auth_routes
 from .app.db import create_db_and_tables
 from .configs import settings
 from .logging import logger
 from .routes import init_gui_routes
+from .storage.flush import coalescer
 
 logger.info("Starting BeaverHabits...")
 
@@ -19,6 +21,8 @@ async def lifespan(_: FastAPI):
     await create_db_and_tables()
     logging.info("Database and tables created")
     yield
+    logging.info("Flushing pending habit list writes")
+    await coalescer.flush_all()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -38,6 +42,7 @@ def read_root():
 
 # auth
 init_auth_routes(app)
+init_api_routes(app)
 init_gui_routes(app)
 
 
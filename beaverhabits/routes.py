@@ -1,31 +1,109 @@
+import re
+from dataclasses import dataclass, field
+from enum import Enum
 from typing import Optional
 
 from fastapi import Depends, FastAPI, HTTPException, Request
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, Response
 from fastapi.routing import APIRoute
 from nicegui import app, ui
+from starlette.routing import BaseRoute, Mount
 
 from beaverhabits.frontend.import_page import import_ui_page
 
 from . import const, views
 from .app.auth import (
+    current_page_user,
     user_authenticate,
+    user_authenticate_request,
     user_check_token,
     user_create,
     user_create_token,
 )
 from .app.crud import get_user_count
 from .app.db import User
-from .app.users import current_active_user
+from .app.password import HashingBusy
+from .conditional import check_not_modified
 from .configs import settings
+from .export import export_response
 from .frontend.add_page import add_page_ui
 from .frontend.cal_heatmap_page import heatmap_page
 from .frontend.habit_page import habit_page_ui
 from .frontend.index_page import index_page_ui
+from .storage.dict import DictHabitList
 from .storage.meta import GUI_ROOT_PATH
 from .utils import dummy_days, get_user_today_date
 
-UNRESTRICTED_PAGE_ROUTES = ("/login", "/register", "/demo", "/demo/add")
+UNRESTRICTED_PAGE_ROUTES = (
+    "/login",
+    "/register",
+    "/demo",
+    "/demo/add",
+    "/demo/habits/{habit_id}",
+    "/demo/export",
+)
+# NiceGUI assets and internals, served without auth
+STATIC_PATH_PREFIXES = ("/_nicegui", "/favicon.ico")
+
+
+class RouteKind(Enum):
+    PROTECTED = "PROTECTED"
+    UNRESTRICTED = "UNRESTRICTED"
+    STATIC = "STATIC"
+    API = "API"
+
+
+@dataclass
+class RouteTable:
+    """Kind of every route, compiled once from the app routes
+
+    Paths without parameters are looked up in a dict, the others are
+    matched against the route regexes in order. Unknown paths are API.
+    """
+
+    exact: dict[str, RouteKind] = field(default_factory=dict)
+    patterns: list[tuple[re.Pattern, RouteKind]] = field(default_factory=list)
+
+    @classmethod
+    def compile(cls, routes: list[BaseRoute]) -> "RouteTable":
+        table = cls()
+        for route in routes:
+            path = getattr(route, "path", "")
+            if isinstance(route, Mount) or path.startswith(STATIC_PATH_PREFIXES):
+                kind = RouteKind.STATIC
+            elif not isinstance(route, APIRoute):
+                kind = RouteKind.API
+            elif path in UNRESTRICTED_PAGE_ROUTES:
+                kind = RouteKind.UNRESTRICTED
+            else:
+                kind = RouteKind.PROTECTED
+
+            if "{" not in path:
+                table.exact.setdefault(path, kind)
+            else:
+                table.patterns.append((route.path_regex, kind))  # type: ignore
+        return table
+
+    def classify(self, path: str) -> RouteKind:
+        if path.startswith(STATIC_PATH_PREFIXES):
+            return RouteKind.STATIC
+        if (kind := self.exact.get(path)) is not None:
+            return kind
+        for regex, kind in self.patterns:
+            if regex.match(path):
+                return kind
+        return RouteKind.API
+
+
+def set_authorization(headers: list[tuple[bytes, bytes]], value: bytes) -> None:
+    """Replace the authorization header in place"""
+    found = False
+    for i, (name, _) in enumerate(headers):
+        if name == b"authorization":
+            headers[i] = (name, value)
+            found = True
+    if not found:
+        headers.append((b"authorization", value))
 
 
 @ui.page("/demo")
@@ -49,19 +127,18 @@ async def demo_habit_page(habit_id: str) -> None:
     habit_page_ui(today, habit)
 
 
-@ui.page("/demo/export")
-async def demo_export() -> None:
+@app.get("/demo/export")
+async def demo_export(request: Request) -> Response:
     habit_list = views.get_session_habit_list()
-    if not habit_list:
-        ui.notify("No habits to export", color="negative")
-        return
-    await views.export_user_habit_list(habit_list, "demo")
+    if not isinstance(habit_list, DictHabitList):
+        raise HTTPException(status_code=404, detail="No habits to export")
+    return export_response(request, habit_list, "demo")
 
 
 @ui.page("/gui")
 @ui.page("/")
 async def index_page(
-    user: User = Depends(current_active_user),
+    user: User = Depends(current_page_user),
 ) -> None:
     days = await dummy_days(settings.INDEX_HABIT_ITEM_COUNT)
     habits = await views.get_or_create_user_habit_list(user, days)
@@ -69,14 +146,14 @@ async def index_page(
 
 
 @ui.page("/gui/add")
-async def add_page(user: User = Depends(current_active_user)) -> None:
+async def add_page(user: User = Depends(current_page_user)) -> None:
     days = await dummy_days(settings.INDEX_HABIT_ITEM_COUNT)
     habits = await views.get_or_create_user_habit_list(user, days)
     add_page_ui(habits)
 
 
 @ui.page("/gui/habits/{habit_id}")
-async def habit_page(habit_id: str, user: User = Depends(current_active_user)) -> None:
+async def habit_page(habit_id: str, user: User = Depends(current_page_user)) -> None:
     today = await get_user_today_date()
     habit = await views.get_user_habit(user, habit_id)
     habit_page_ui(today, habit)
@@ -84,31 +161,39 @@ async def habit_page(habit_id: str, user: User = Depends(current_active_user)) -
 
 @ui.page("/gui/habits/{habit_id}/heatmap")
 async def gui_habit_page_heatmap(
-    habit_id: str, user: User = Depends(current_active_user)
+    habit_id: str, user: User = Depends(current_page_user)
 ) -> None:
     habit = await views.get_user_habit(user, habit_id)
     today = await get_user_today_date()
     heatmap_page(today, habit)
 
 
-@ui.page("/gui/export")
-async def gui_export(user: User = Depends(current_active_user)) -> None:
+@app.get("/gui/export")
+async def gui_export(
+    request: Request, user: User = Depends(current_page_user)
+) -> Response:
+    if (stamp := await views.get_user_habit_list_stamp(user)) is not None:
+        check_not_modified(request, stamp)
+
     habit_list = await views.get_user_habit_list(user)
-    if not habit_list:
-        ui.notify("No habits to export", color="negative")
-        return
-    await views.export_user_habit_list(habit_list, user.email)
+    if not isinstance(habit_list, DictHabitList):
+        raise HTTPException(status_code=404, detail="No habits to export")
+    return export_response(request, habit_list, user.email)
 
 
 @ui.page("/gui/import")
-async def gui_import(user: User = Depends(current_active_user)) -> None:
+async def gui_import(user: User = Depends(current_page_user)) -> None:
     import_ui_page(user)
 
 
 @ui.page("/login")
 async def login_page() -> Optional[RedirectResponse]:
     async def try_login():
-        user = await user_authenticate(email=email.value, password=password.value)
+        try:
+            user = await user_authenticate(email=email.value, password=password.value)
+        except HashingBusy as e:
+            ui.notify(str(e), color="negative")
+            return
         token = user and await user_create_token(user)
         if token is not None:
             app.storage.user.update({"auth_token": token})
@@ -175,32 +260,26 @@ async def register():
 
 
 def init_gui_routes(fastapi_app: FastAPI):
+    route_table = RouteTable.compile(app.routes)
+
     @app.middleware("http")
     async def AuthMiddleware(request: Request, call_next):
-        # Redirect unauthorized request
-        client_page_routes = [
-            route.path for route in app.routes if isinstance(route, APIRoute)
-        ]
-        if not await user_check_token(app.storage.user.get("auth_token", None)):
-            if (
-                request.url.path in client_page_routes
-                and request.url.path not in UNRESTRICTED_PAGE_ROUTES
-            ):
-                root_path = request.scope["root_path"]
-                app.storage.user["referrer_path"] = request.url.path.removeprefix(
-                    root_path
-                )
-                return RedirectResponse(request.url_for(login_page.__name__))
-
-        # Remove original authorization header
-        request.scope["headers"] = [
-            e for e in request.scope["headers"] if not e[0] == b"authorization"
-        ]
-        # add new authorization header
-        request.scope["headers"].append(
-            (b"authorization", f"Bearer {app.storage.user.get('auth_token')}".encode())
-        )
+        root_path = request.scope["root_path"]
+        path = request.url.path.removeprefix(root_path)
+        kind = route_table.classify(path)
+        if kind == RouteKind.STATIC:
+            return await call_next(request)
 
+        # Redirect unauthorized request
+        token = app.storage.user.get("auth_token", None)
+        if kind == RouteKind.PROTECTED and not await user_authenticate_request(
+            request.scope, token
+        ):
+            app.storage.user["referrer_path"] = path
+            return RedirectResponse(request.url_for(login_page.__name__))
+
+        # Replace authorization header
+        set_authorization(request.scope["headers"], f"Bearer {token}".encode())
         return await call_next(request)
 
     ui.run_with(
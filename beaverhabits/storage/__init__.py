@@ -1 +1,44 @@
-from beaverhabits.configs import StorageType, settings\\nfrom beaverhabits.storage.session_file import SessionDictStorage, SessionStorage\\nfrom beaverhabits.storage.storage import UserStorage\\nfrom beaverhabits.storage.user_db import UserDatabaseStorage\\nfrom beaverhabits.storage.user_file import UserDiskStorage\\n\\nclass UserHabitListManager:\\n    def __init__(self):\\n        self.session_storage = SessionDictStorage()\\n        self.user_disk_storage = UserDiskStorage()\\n        self.user_database_storage = UserDatabaseStorage()\\n        self.sqlite_storage = None\\n\\n    def get_sessions_storage(self) -> SessionStorage:\\n        return self.session_storage\\n\\n    def get_user_storage(self) -> UserStorage:\\n        if settings.HABITS_STORAGE == StorageType.USER_DISK:\\n            return self.user_disk_storage\\n        elif settings.HABITS_STORAGE == StorageType.USER_DATABASE:\\n            return self.user_database_storage\\n        else:\\n            raise NotImplementedError(\\"Storage type not implemented\\")\\\n\\n# Example usage\\nmanager = UserHabitListManager()\\nsession_storage = manager.get_sessions_storage()\\nuser_storage = manager.get_user_storage()
\ No newline at end of file
+import functools
+
+from beaverhabits.configs import StorageType, settings
+from beaverhabits.storage.cache import CachedUserStorage
+from beaverhabits.storage.session_file import SessionDictStorage, SessionStorage
+from beaverhabits.storage.storage import UserStorage
+from beaverhabits.storage.user_db import UserDatabaseStorage
+from beaverhabits.storage.user_db_table import UserTableDatabaseStorage
+from beaverhabits.storage.user_file import UserDiskStorage
+from beaverhabits.storage.user_journal import UserJournalDiskStorage
+
+session_storage = SessionDictStorage()
+user_disk_storage = UserDiskStorage()
+user_journal_disk_storage = UserJournalDiskStorage()
+user_database_storage = UserDatabaseStorage()
+user_table_database_storage = UserTableDatabaseStorage()
+
+
+def get_sessions_storage() -> SessionStorage:
+    return session_storage
+
+
+def get_user_backend_storage() -> UserStorage:
+    if settings.HABITS_STORAGE == StorageType.USER_DISK:
+        return user_disk_storage
+    elif settings.HABITS_STORAGE == StorageType.USER_DISK_JOURNAL:
+        return user_journal_disk_storage
+    elif settings.HABITS_STORAGE == StorageType.USER_DATABASE:
+        return user_database_storage
+    elif settings.HABITS_STORAGE == StorageType.USER_DATABASE_TABLES:
+        return user_table_database_storage
+
+    raise NotImplementedError("Storage type not implemented")
+
+
+@functools.cache
+def get_user_dict_storage() -> UserStorage:
+    storage = get_user_backend_storage()
+    if settings.HABITS_CACHE_ENTRIES <= 0:
+        return storage
+
+    return CachedUserStorage(
+        storage, settings.HABITS_CACHE_ENTRIES, settings.HABITS_CACHE_TTL_SECONDS
+    )
@@ -0,0 +1,76 @@
+import base64
+import datetime
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, Optional
+
+
+@dataclass
+class Bitset:
+    """Days packed as bits, starting from `start`
+
+    Bit `i` (LSB first) of the array stands for `start + i days`, e.g.
+    {"start": "2021-01-01", "bits": "BQ=="} -> 2021-01-01, 2021-01-03
+    """
+
+    start: Optional[datetime.date] = None
+    bits: bytearray = field(default_factory=bytearray)
+
+    @classmethod
+    def from_days(cls, days: Iterable[datetime.date]) -> "Bitset":
+        days = sorted(set(days))
+        if not days:
+            return cls()
+
+        start = days[0]
+        bits = bytearray((days[-1] - start).days // 8 + 1)
+        for day in days:
+            offset = (day - start).days
+            bits[offset >> 3] |= 1 << (offset & 7)
+        return cls(start, bits)
+
+    @classmethod
+    def decode(cls, d: dict) -> "Bitset":
+        if not d.get("start"):
+            return cls()
+        start = datetime.date.fromisoformat(d["start"])
+        return cls(start, bytearray(base64.b64decode(d["bits"])))
+
+    def encode(self) -> dict:
+        return {
+            "start": self.start.isoformat() if self.start else None,
+            "bits": base64.b64encode(self.bits).decode(),
+        }
+
+    def __contains__(self, day: datetime.date) -> bool:
+        if self.start is None or day < self.start:
+            return False
+        offset = (day - self.start).days
+        if offset >> 3 >= len(self.bits):
+            return False
+        return bool(self.bits[offset >> 3] & (1 << (offset & 7)))
+
+    def __iter__(self) -> Iterator[datetime.date]:
+        if self.start is None:
+            return
+        for i, byte in enumerate(self.bits):
+            while byte:
+                bit = (byte & -byte).bit_length() - 1
+                yield self.start + datetime.timedelta(days=i * 8 + bit)
+                byte &= byte - 1
+
+    def set(self, day: datetime.date, done: bool) -> None:
+        if not done and day not in self:
+            return
+        if self.start is None or day < self.start:
+            # Rare: ticking a day before the first one, re-pack from scratch
+            rebased = Bitset.from_days([*self, day])
+            self.start, self.bits = rebased.start, rebased.bits
+            return
+
+        offset = (day - self.start).days
+        if (index := offset >> 3) >= len(self.bits):
+            self.bits.extend(bytes(index - len(self.bits) + 1))
+        if done:
+            self.bits[index] |= 1 << (offset & 7)
+        else:
+            self.bits[index] &= ~(1 << (offset & 7)) & 0xFF
@@ -0,0 +1,155 @@
+import time
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from beaverhabits.app.db import User
+from beaverhabits.storage.storage import (
+    ChangeKind,
+    HabitList,
+    HabitListChange,
+    HabitListStamp,
+    UserStorage,
+)
+
+
+@dataclass
+class CacheEntry[V]:
+    value: V
+    size: int
+    expires_at: Optional[float] = None
+
+
+class LRUCache[K, V]:
+    """Least recently used cache bounded by entry count and total size
+
+    Entries optionally expire `ttl` seconds after they were put. `put`
+    returns the evicted items so that the caller can flush them.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        max_bytes: Optional[int] = None,
+        ttl: Optional[float] = None,
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        self.entries: OrderedDict[K, CacheEntry[V]] = OrderedDict()
+        self.bytes = 0
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self.entries
+
+    def get(self, key: K) -> Optional[V]:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        if entry.expires_at is not None and entry.expires_at < time.monotonic():
+            self.pop(key)
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry.value
+
+    def put(self, key: K, value: V, size: int = 0) -> list[tuple[K, V]]:
+        self.pop(key)
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        self.entries[key] = CacheEntry(value, size, expires_at)
+        self.bytes += size
+
+        evicted = []
+        while len(self.entries) > 1 and (
+            len(self.entries) > self.max_entries
+            or (self.max_bytes is not None and self.bytes > self.max_bytes)
+        ):
+            k, entry = self.entries.popitem(last=False)
+            self.bytes -= entry.size
+            self.evictions += 1
+            evicted.append((k, entry.value))
+        return evicted
+
+    def resize(self, key: K, size: int) -> None:
+        if (entry := self.entries.get(key)) is not None:
+            self.bytes += size - entry.size
+            entry.size = size
+
+    def pop(self, key: K) -> Optional[V]:
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return None
+        self.bytes -= entry.size
+        return entry.value
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class CachedUserStorage[L: HabitList](UserStorage[L]):
+    """Read-through cache of loaded habit lists in front of any UserStorage
+
+    The cached lists are the live objects returned by the wrapped storage,
+    so every page of a user shares them, and their subscribers form the
+    user's change feed. Lists evicted from the cache but still used by a
+    page are shared too, instead of being loaded twice.
+
+    Saves invalidate the user's entry and tell the subscribers of the
+    replaced list to reload, merges only invalidate it.
+    """
+
+    def __init__(self, storage: UserStorage[L], max_entries: int, ttl: float) -> None:
+        self.storage = storage
+        self.cache: LRUCache[str, L] = LRUCache(max_entries, ttl=ttl)
+        self.live: weakref.WeakValueDictionary[str, L] = weakref.WeakValueDictionary()
+
+    async def get_user_habit_list(self, user: User) -> Optional[L]:
+        if (habit_list := self.cache.get(user.email)) is not None:
+            return habit_list
+
+        habit_list = self.live.get(user.email)
+        if habit_list is None:
+            habit_list = await self.storage.get_user_habit_list(user)
+        if habit_list is not None:
+            self.cache.put(user.email, habit_list)
+            self.live[user.email] = habit_list
+        return habit_list
+
+    async def get_user_habit_list_stamp(self, user: User) -> Optional[HabitListStamp]:
+        habit_list = self.cache.get(user.email) or self.live.get(user.email)
+        if habit_list is not None:
+            return habit_list.stamp
+        return await self.storage.get_user_habit_list_stamp(user)
+
+    async def save_user_habit_list(self, user: User, habit_list: L) -> None:
+        await self.storage.save_user_habit_list(user, habit_list)
+        self.cache.pop(user.email)
+        replaced = self.live.get(user.email)
+        if replaced is not None and replaced is not habit_list:
+            del self.live[user.email]
+            replaced.publish(HabitListChange(ChangeKind.RELOAD))
+
+    async def merge_user_habit_list(self, user: User, other: L) -> L:
+        habit_list = await self.storage.merge_user_habit_list(user, other)
+        self.cache.pop(user.email)
+        return habit_list
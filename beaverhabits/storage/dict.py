@@ -1,13 +1,35 @@
+import asyncio
 import datetime
+import secrets
+import time
 from dataclasses import dataclass, field
-from typing import Optional
-
-from beaverhabits.storage.storage import CheckedRecord, Habit, HabitList
+from typing import ClassVar, Iterable, Optional
+
+from nicegui.observables import ObservableCollection
+
+from beaverhabits.configs import RecordEncoding
+from beaverhabits.storage.bitset import Bitset
+from beaverhabits.storage.storage import (
+    ChangeKind,
+    ChangeListener,
+    CheckedRecord,
+    Habit,
+    HabitList,
+    HabitListChange,
+    HabitListStamp,
+    MergeStats,
+    MergeStatus,
+    TickListener,
+)
 from beaverhabits.utils import generate_short_hash
 
 DAY_MASK = "%Y-%m-%d"
 MONTH_MASK = "%Y/%m"
 
+BITSET_KEY = "bitset"
+UNCHECKED_KEY = "unchecked"
+RECORD_KEYS = ("records", BITSET_KEY, UNCHECKED_KEY)
+
 
 @dataclass(init=False)
 class DictStorage:
@@ -45,8 +67,66 @@ class DictRecord(CheckedRecord, DictStorage):
         self.data["done"] = value
 
 
+@dataclass
+class DictBitsetRecord(CheckedRecord):
+    """Record view of one day in a bitset encoded habit"""
+
+    habit: "DictHabit"
+    _day: datetime.date
+
+    @property
+    def day(self) -> datetime.date:
+        return self._day
+
+    @property
+    def done(self) -> bool:
+        return self._day in self.habit._records_bitset
+
+    @done.setter
+    def done(self, value: bool) -> None:
+        self.habit._set_bit(self._day, value)
+
+
 @dataclass
 class DictHabit(Habit[DictRecord], DictStorage):
+    """Dict storage for Habit
+
+    Records are indexed by day lazily, the index follows appends to
+    `data["records"]` and is rebuilt only when the list itself is replaced.
+
+    Alternatively, done days are packed in `data["bitset"]`, see `Bitset`,
+    and days explicitly unchecked in `data["unchecked"]`. Both encodings
+    expose the same records.
+
+    Subscribed listeners are called for each ticked day of this wrapper.
+    """
+
+    _index: dict[datetime.date, dict] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+    _indexed_records: Optional[list] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _indexed_count: int = field(default=0, init=False, repr=False, compare=False)
+    _bitset: Bitset = field(
+        default_factory=Bitset, init=False, repr=False, compare=False
+    )
+    _decoded_bitset: Optional[dict] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _unchecked: Bitset = field(
+        default_factory=Bitset, init=False, repr=False, compare=False
+    )
+    _decoded_unchecked: Optional[dict] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _habit_list: Optional["DictHabitList"] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _listeners: list[TickListener] = field(
+        default_factory=list, init=False, repr=False, compare=False
+    )
+
     @property
     def id(self) -> str:
         if "id" not in self.data:
@@ -56,6 +136,8 @@ class DictHabit(Habit[DictRecord], DictStorage):
     @id.setter
     def id(self, value: str) -> None:
         self.data["id"] = value
+        if self._habit_list is not None:
+            self._habit_list._invalidate()
 
     @property
     def name(self) -> str:
@@ -64,6 +146,7 @@ class DictHabit(Habit[DictRecord], DictStorage):
     @name.setter
     def name(self, value: str) -> None:
         self.data["name"] = value
+        self._publish(ChangeKind.NAME)
 
     @property
     def star(self) -> bool:
@@ -72,28 +155,177 @@ class DictHabit(Habit[DictRecord], DictStorage):
     @star.setter
     def star(self, value: int) -> None:
         self.data["star"] = value
+        self._publish(ChangeKind.STAR)
+
+    def _publish(self, kind: ChangeKind, **kwargs) -> None:
+        if self._habit_list is None:
+            return
+        if kind == ChangeKind.TICK:
+            self._habit_list._touch()
+        else:
+            self._habit_list._invalidate()
+        self._habit_list.publish(HabitListChange(kind, self.id, **kwargs))
+
+    @property
+    def encoding(self) -> RecordEncoding:
+        if BITSET_KEY in self.data:
+            return RecordEncoding.BITSET
+        return RecordEncoding.LIST
 
     @property
-    def records(self) -> list[DictRecord]:
+    def records(self) -> list[DictRecord] | list[DictBitsetRecord]:
+        if self.encoding == RecordEncoding.BITSET:
+            days = sorted({*self._records_bitset, *self._unchecked_bitset})
+            return [DictBitsetRecord(self, day) for day in days]
         return [DictRecord(d) for d in self.data["records"]]
 
+    @property
+    def _records_bitset(self) -> Bitset:
+        encoded = self.data[BITSET_KEY]
+        if encoded is not self._decoded_bitset:
+            self._bitset = Bitset.decode(encoded)
+            self._decoded_bitset = encoded
+        return self._bitset
+
+    @property
+    def _unchecked_bitset(self) -> Bitset:
+        encoded = self.data.get(UNCHECKED_KEY)
+        if encoded is None:
+            return Bitset()
+        if encoded is not self._decoded_unchecked:
+            self._unchecked = Bitset.decode(encoded)
+            self._decoded_unchecked = encoded
+        return self._unchecked
+
+    def _set_bit(self, day: datetime.date, done: bool) -> None:
+        self._set_bits({day: done})
+
+    def _set_bits(self, changes: dict[datetime.date, bool]) -> None:
+        bitset, unchecked = self._records_bitset, self._unchecked_bitset
+        for day, done in changes.items():
+            bitset.set(day, done)
+            unchecked.set(day, not done)
+        # Replace the encoded values, observers are notified once below
+        if UNCHECKED_KEY in self.data or unchecked.start is not None:
+            dict.__setitem__(self.data, UNCHECKED_KEY, unchecked.encode())
+            self._unchecked = unchecked
+            self._decoded_unchecked = self.data[UNCHECKED_KEY]
+        self.data[BITSET_KEY] = bitset.encode()
+        self._decoded_bitset = self.data[BITSET_KEY]
+
+    @property
+    def _records_index(self) -> dict[datetime.date, dict]:
+        records = self.data["records"]
+        if records is not self._indexed_records:
+            self._index = {}
+            self._indexed_records, self._indexed_count = records, 0
+
+        # Records appended through other views of the same data
+        for d in records[self._indexed_count :]:
+            day = datetime.datetime.strptime(d["day"], DAY_MASK).date()
+            self._index.setdefault(day, d)
+        self._indexed_count = len(records)
+
+        return self._index
+
+    @property
+    def ticked_days(self) -> list[datetime.date]:
+        if self.encoding == RecordEncoding.BITSET:
+            return list(self._records_bitset)
+        return [day for day, d in self._records_index.items() if d["done"]]
+
+    def get_record_by(
+        self, day: datetime.date
+    ) -> Optional[DictRecord | DictBitsetRecord]:
+        if self.encoding == RecordEncoding.BITSET:
+            if day in self._records_bitset or day in self._unchecked_bitset:
+                return DictBitsetRecord(self, day)
+        elif (d := self._records_index.get(day)) is not None:
+            return DictRecord(d)
+
+    def get_records_between(
+        self, start: datetime.date, end: datetime.date
+    ) -> list[DictRecord] | list[DictBitsetRecord]:
+        """Records from start to end included, looked up day by day"""
+        days = (
+            start + datetime.timedelta(days=i) for i in range((end - start).days + 1)
+        )
+        if self.encoding == RecordEncoding.BITSET:
+            bitset, unchecked = self._records_bitset, self._unchecked_bitset
+            return [
+                DictBitsetRecord(self, day)
+                for day in days
+                if day in bitset or day in unchecked
+            ]
+
+        index = self._records_index
+        return [DictRecord(d) for day in days if (d := index.get(day)) is not None]
+
+    def encoded(self, encoding: RecordEncoding) -> dict:
+        """Habit data with records in the given encoding, done and unchecked"""
+        if self.encoding == encoding:
+            return self.data
+
+        d = {k: v for k, v in self.data.items() if k not in RECORD_KEYS}
+        records = sorted(self.records, key=lambda r: r.day)
+        if encoding == RecordEncoding.BITSET:
+            d[BITSET_KEY] = Bitset.from_days(r.day for r in records if r.done).encode()
+            unchecked = [r.day for r in records if not r.done]
+            if unchecked:
+                d[UNCHECKED_KEY] = Bitset.from_days(unchecked).encode()
+        else:
+            d["records"] = [
+                {"day": r.day.strftime(DAY_MASK), "done": r.done} for r in records
+            ]
+        return d
+
     async def tick(self, day: datetime.date, done: bool) -> None:
-        if record := next((r for r in self.records if r.day == day), None):
-            record.done = done
+        await self.tick_many({day: done})
+
+    async def tick_many(self, changes: dict[datetime.date, bool]) -> None:
+        """Apply all changes with a single change of the underlying data"""
+        if not changes:
+            return
+
+        if self.encoding == RecordEncoding.BITSET:
+            self._set_bits(changes)
         else:
-            data = {"day": day.strftime(DAY_MASK), "done": done}
-            self.data["records"].append(data)
+            self._set_records(changes)
+
+        for day, done in changes.items():
+            for listener in list(self._listeners):
+                listener(day, done)
+        self._publish(ChangeKind.TICK, ticks=dict(changes))
+
+    def _set_records(self, changes: dict[datetime.date, bool]) -> None:
+        index = self._records_index
+        added = []
+        for day, done in changes.items():
+            if (d := index.get(day)) is None:
+                added.append({"day": day.strftime(DAY_MASK), "done": done})
+            else:
+                # Updated in place, observers are notified once below
+                dict.__setitem__(d, "done", done)
+
+        records = self.data["records"]
+        if added:
+            records.extend(added)
+        elif isinstance(records, ObservableCollection):
+            records._handle_change()
+
+    def subscribe(self, listener: TickListener) -> None:
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener: TickListener) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
 
     async def merge(self, other: "DictHabit") -> "DictHabit":
-        self_ticks = {r.data["day"] for r in self.records if r.done}
-        other_ticks = {r.data["day"] for r in other.records if r.done}
-        result = sorted(list(self_ticks | other_ticks))
+        result = sorted(set(self.ticked_days).union(other.ticked_days))
 
-        d = {
-            "name": self.name,
-            "records": [{"day": day, "done": True} for day in result],
-        }
-        return DictHabit(d)
+        d = {k: v for k, v in self.data.items() if k not in RECORD_KEYS}
+        d["records"] = [{"day": day.strftime(DAY_MASK), "done": True} for day in result]
+        return DictHabit(DictHabit(d).encoded(self.encoding))
 
     def __eq__(self, other: object) -> bool:
         return isinstance(other, DictHabit) and self.id == other.id
@@ -106,6 +338,8 @@ class DictHabit(Habit[DictRecord], DictStorage):
 class DictHabitList(HabitList[DictHabit], DictStorage):
     """Dict storage for HabitList
 
+    Subscribed listeners get every change of the list and of its habits.
+
     Example:
     {
         "habits": [
@@ -119,35 +353,148 @@ class DictHabitList(HabitList[DictHabit], DictStorage):
             {
                 "name": "habit2",
                 "records": []
+            },
+            {
+                "name": "habit3",
+                "bitset": {"start": "2021-01-01", "bits": "Aw=="},
+                "unchecked": {"start": "2021-01-04", "bits": "AQ=="}
             ...
     """
 
+    habit_class: ClassVar[type[DictHabit]] = DictHabit
+
+    _habits: Optional[list[DictHabit]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _habits_by_id: dict[str, DictHabit] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+    _habits_source: Optional[list] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _listeners: list[ChangeListener] = field(
+        default_factory=list, init=False, repr=False, compare=False
+    )
+    # Time of the last change made through this wrapper, or of the load
+    modified_at: float = field(
+        default_factory=time.time, init=False, repr=False, compare=False
+    )
+    # Changes made through this wrapper, on top of the loaded state
+    version: int = field(default=0, init=False, repr=False, compare=False)
+    # Identifies the loaded state, e.g. its stored content hash
+    etag_base: str = field(
+        default_factory=lambda: secrets.token_hex(8),
+        init=False,
+        repr=False,
+        compare=False,
+    )
+
     @property
     def habits(self) -> list[DictHabit]:
+        """Star ordered habits, cached until the list or a star/name changes"""
+        return self._cached_habits()[0]
+
+    def _cached_habits(self) -> tuple[list[DictHabit], dict[str, DictHabit]]:
+        data = self.data["habits"]
+        if self._habits_source is not data or len(self._habits or ()) != len(data):
+            # Keep the wrappers, and their record indexes, of unchanged habits
+            previous = {id(h.data): h for h in self._habits or ()}
+            habits = [previous.get(id(d)) or self.habit_class(d) for d in data]
+            habits.sort(key=lambda x: x.star, reverse=True)
+
+            self._habits_by_id = {}
+            for habit in habits:
+                habit._habit_list = self
+                self._habits_by_id.setdefault(habit.id, habit)
+            self._habits, self._habits_source = habits, data
+
+        return self._habits, self._habits_by_id
+
+    def _invalidate(self) -> None:
+        self._habits_source = None
+        self._touch()
+
+    def _touch(self) -> None:
+        self.modified_at = time.time()
+        self.version += 1
+
+    @property
+    def stamp(self) -> HabitListStamp:
+        return HabitListStamp.of(self.etag_base, self.version, self.modified_at)
+
+    def encoded(self, encoding: RecordEncoding) -> dict:
         habits = [DictHabit(d) for d in self.data["habits"]]
-        habits.sort(key=lambda x: x.star, reverse=True)
-        return habits
+        if all(h.encoding == encoding for h in habits):
+            return self.data
+
+        return {**self.data, "habits": [h.encoded(encoding) for h in habits]}
 
     async def get_habit_by(self, habit_id: str) -> Optional[DictHabit]:
-        for habit in self.habits:
-            if habit.id == habit_id:
-                return habit
+        return self._cached_habits()[1].get(habit_id)
 
     async def add(self, name: str) -> None:
         d = {"name": name, "records": [], "id": generate_short_hash(name)}
         self.data["habits"].append(d)
+        self._invalidate()
+        self.publish(HabitListChange(ChangeKind.ADD, d["id"]))
 
     async def remove(self, item: DictHabit) -> None:
         self.data["habits"].remove(item.data)
+        self._invalidate()
+        self.publish(HabitListChange(ChangeKind.REMOVE, item.id))
 
-    async def merge(self, other: "DictHabitList") -> "DictHabitList":
-        result = set(self.habits).symmetric_difference(set(other.habits))
+    def subscribe(self, listener: ChangeListener) -> None:
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener: ChangeListener) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
 
-        # Merge the habit if it exists
-        for self_habit in self.habits:
-            for other_habit in other.habits:
-                if self_habit == other_habit:
-                    new_habit = await self_habit.merge(other_habit)
-                    result.add(new_habit)
+    def publish(self, change: HabitListChange) -> None:
+        for listener in list(self._listeners):
+            listener(change)
 
-        return DictHabitList({"habits": [h.data for h in result]})
+    async def merge(self, other: "DictHabitList") -> "DictHabitList":
+        habit_list, _ = await self.merge_stream(other.habits)
+        return habit_list
+
+    async def merge_stream(
+        self, others: Iterable[DictHabit]
+    ) -> tuple["DictHabitList", MergeStats]:
+        """Merge incoming habits one at a time, joined on habit id
+
+        Habits only in `self` are kept unchanged, the others are added or
+        merged day by day. `self` is not modified. Yields to the event loop
+        between habits, so large imports don't hold up other clients.
+        """
+        _, habits_by_id = self._cached_habits()
+        result: dict[str, DictHabit] = {}
+        stats = MergeStats()
+
+        for other in others:
+            await asyncio.sleep(0)
+            if (habit := result.get(other.id) or habits_by_id.get(other.id)) is None:
+                result[other.id] = other
+                stats.statuses[other.id] = MergeStatus.ADDED
+                continue
+
+            # Counted as merged only if the import adds done days
+            if set(other.ticked_days) <= set(habit.ticked_days):
+                result[other.id] = habit
+                stats.statuses.setdefault(other.id, MergeStatus.UNCHANGED)
+                continue
+
+            result[other.id] = await habit.merge(other)
+            if stats.statuses.get(other.id) != MergeStatus.ADDED:
+                stats.statuses[other.id] = MergeStatus.MERGED
+
+        habits = []
+        for d in self.data["habits"]:
+            if (habit := result.pop(d["id"], None)) is None:
+                habits.append(d)
+                stats.statuses[d["id"]] = MergeStatus.UNCHANGED
+            else:
+                habits.append(habit.data)
+        habits.extend(h.data for h in result.values())
+
+        return DictHabitList({"habits": habits}), stats
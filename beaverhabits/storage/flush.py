@@ -0,0 +1,134 @@
+import asyncio
+import contextlib
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Iterator, Optional
+
+from nicegui import background_tasks, core
+
+from beaverhabits.configs import settings
+from beaverhabits.logging import logger
+
+Write = Callable[[], Awaitable[None]]
+
+
+@dataclass
+class PendingWrite:
+    write: Write
+    first_change: float
+    changes: int = 0
+    timer: Optional[asyncio.TimerHandle] = None
+
+
+class WriteCoalescer:
+    """Collapse bursts of changes into one write per key
+
+    A write is flushed once no change arrived for `interval_ms`, or at the
+    latest `max_delay_ms` after the first pending change, or as soon as
+    `max_pending` changes are pending. Writes of the same key never overlap.
+    Within `hold(key)`, writes of that key wait for the end of the block.
+    """
+
+    def __init__(self, interval_ms: int, max_delay_ms: int, max_pending: int) -> None:
+        self.interval = interval_ms / 1000
+        self.max_delay = max_delay_ms / 1000
+        self.max_pending = max_pending
+
+        self.pending: dict[str, PendingWrite] = {}
+        self.running: dict[str, asyncio.Task] = {}
+        # Hold count by key
+        self.held: dict[str, int] = {}
+
+        # Counters
+        self.changes = 0
+        self.writes = 0
+        self.writes_saved = 0
+
+    def schedule(self, key: str, write: Write) -> None:
+        if not core.loop:
+            core.app.on_startup(write())
+            return
+
+        self.changes += 1
+        now = core.loop.time()
+        if (pending := self.pending.get(key)) is None:
+            pending = self.pending[key] = PendingWrite(write, now)
+        pending.write = write
+        pending.changes += 1
+        if pending.timer:
+            pending.timer.cancel()
+            pending.timer = None
+        if key not in self.held:
+            self._arm(key, pending, now)
+
+    def _arm(self, key: str, pending: PendingWrite, now: float) -> None:
+        if (
+            self.interval <= 0
+            or pending.changes >= self.max_pending
+            or now - pending.first_change >= self.max_delay
+        ):
+            self._flush(key)
+        else:
+            delay = min(self.interval, pending.first_change + self.max_delay - now)
+            pending.timer = core.loop.call_later(delay, self._flush, key)
+
+    @contextlib.contextmanager
+    def hold(self, key: str) -> Iterator[None]:
+        """Defer the writes of `key` scheduled in the block, e.g. by a batch"""
+        self.held[key] = self.held.get(key, 0) + 1
+        try:
+            yield
+        finally:
+            self.held[key] -= 1
+            if not self.held[key]:
+                del self.held[key]
+                pending = self.pending.get(key)
+                if pending is not None and pending.timer is None and core.loop:
+                    self._arm(key, pending, core.loop.time())
+
+    def _flush(self, key: str) -> None:
+        if (pending := self.pending.get(key)) is None:
+            return
+        if pending.timer:
+            pending.timer.cancel()
+            pending.timer = None
+        # Flushed again once the running write is done
+        if key in self.running:
+            return
+
+        self.pending.pop(key)
+        task = background_tasks.create(self._write(key, pending), name=key)
+        self.running[key] = task
+
+    async def _write(self, key: str, pending: PendingWrite) -> None:
+        try:
+            await pending.write()
+            self.writes += 1
+            self.writes_saved += pending.changes - 1
+            logger.info(
+                f"[Flush] {key}: {pending.changes} changes in 1 write, "
+                + f"{self.writes_saved} writes saved in total"
+            )
+        finally:
+            self.running.pop(key, None)
+            if (
+                (p := self.pending.get(key))
+                and p.timer is None
+                and key not in self.held
+            ):
+                self._flush(key)
+
+    async def flush_all(self) -> None:
+        """Write everything pending now, e.g. on shutdown"""
+        while self.pending or self.running:
+            if self.running:
+                await asyncio.gather(*self.running.values(), return_exceptions=True)
+            for key in list(self.pending):
+                if key not in self.running:
+                    self._flush(key)
+
+
+coalescer = WriteCoalescer(
+    settings.HABITS_FLUSH_INTERVAL_MS,
+    settings.HABITS_FLUSH_MAX_DELAY_MS,
+    settings.HABITS_FLUSH_MAX_PENDING,
+)
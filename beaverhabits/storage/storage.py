@@ -1,5 +1,7 @@
 import datetime
-from typing import List, Optional, Protocol
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Callable, List, Optional, Protocol
 
 from beaverhabits.app.db import User
 
@@ -20,6 +22,33 @@ class CheckedRecord(Protocol):
     __repr__ = __str__
 
 
+# Called with the day and the done state after each tick
+TickListener = Callable[[datetime.date, bool], None]
+
+
+class ChangeKind(Enum):
+    TICK = "tick"
+    NAME = "name"
+    STAR = "star"
+    ADD = "add"
+    REMOVE = "remove"
+    # The stored habit list was replaced, e.g. by an import
+    RELOAD = "reload"
+
+
+@dataclass(frozen=True)
+class HabitListChange:
+    """One change of a habit list, as published to its subscribers"""
+
+    kind: ChangeKind
+    habit_id: Optional[str] = None
+    ticks: dict[datetime.date, bool] = field(default_factory=dict)
+
+
+# Called with each change of a habit list
+ChangeListener = Callable[[HabitListChange], None]
+
+
 class Habit[R: CheckedRecord](Protocol):
     @property
     def id(self) -> str | int: ...
@@ -43,25 +72,89 @@ class Habit[R: CheckedRecord](Protocol):
     def ticked_days(self) -> list[datetime.date]:
         return [r.day for r in self.records if r.done]
 
+    def get_record_by(self, day: datetime.date) -> Optional[R]:
+        return next((r for r in self.records if r.day == day), None)
+
+    def get_records_between(self, start: datetime.date, end: datetime.date) -> List[R]:
+        return [r for r in self.records if start <= r.day <= end]
+
     async def tick(self, day: datetime.date, done: bool) -> None: ...
 
+    async def tick_many(self, changes: dict[datetime.date, bool]) -> None:
+        for day, done in changes.items():
+            await self.tick(day, done)
+
+    def subscribe(self, listener: TickListener) -> None: ...
+
+    def unsubscribe(self, listener: TickListener) -> None: ...
+
     def __str__(self):
         return self.name
 
     __repr__ = __str__
 
 
+@dataclass(frozen=True)
+class HabitListStamp:
+    """Validators of one state of a habit list, for conditional requests"""
+
+    etag: str
+    modified_at: float
+
+    @classmethod
+    def of(cls, base: str, version: int, modified_at: float) -> "HabitListStamp":
+        return cls(f'W/"{base}.{version}"', modified_at)
+
+
 class HabitList[H: Habit](Protocol):
 
     @property
     def habits(self) -> List[H]: ...
 
+    @property
+    def stamp(self) -> Optional[HabitListStamp]:
+        return None
+
     async def add(self, name: str) -> None: ...
 
     async def remove(self, item: H) -> None: ...
 
     async def get_habit_by(self, habit_id: str) -> Optional[H]: ...
 
+    def subscribe(self, listener: ChangeListener) -> None: ...
+
+    def unsubscribe(self, listener: ChangeListener) -> None: ...
+
+    def publish(self, change: HabitListChange) -> None: ...
+
+
+class MergeStatus(Enum):
+    ADDED = "added"
+    MERGED = "merged"
+    UNCHANGED = "unchanged"
+
+
+@dataclass
+class MergeStats:
+    """Merge status by habit id"""
+
+    statuses: dict[str, MergeStatus] = field(default_factory=dict)
+
+    def count(self, status: MergeStatus) -> int:
+        return sum(1 for s in self.statuses.values() if s == status)
+
+    @property
+    def added(self) -> int:
+        return self.count(MergeStatus.ADDED)
+
+    @property
+    def merged(self) -> int:
+        return self.count(MergeStatus.MERGED)
+
+    @property
+    def unchanged(self) -> int:
+        return self.count(MergeStatus.UNCHANGED)
+
 
 class SessionStorage[L: HabitList](Protocol):
     def get_user_habit_list(self) -> Optional[L]: ...
@@ -75,3 +168,7 @@ class UserStorage[L: HabitList](Protocol):
     async def save_user_habit_list(self, user: User, habit_list: L) -> None: ...
 
     async def merge_user_habit_list(self, user: User, other: L) -> L: ...
+
+    async def get_user_habit_list_stamp(self, user: User) -> Optional[HabitListStamp]:
+        """Stamp of the stored habit list, None if it has to be loaded"""
+        return None
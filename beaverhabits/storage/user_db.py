@@ -1,12 +1,21 @@
+import datetime
 from typing import Optional
 
-from nicegui import background_tasks, core
 from nicegui.storage import observables
 
 from beaverhabits.app import crud
 from beaverhabits.app.db import User
+from beaverhabits.configs import RecordEncoding, settings
 from beaverhabits.storage.dict import DictHabitList
-from beaverhabits.storage.storage import UserStorage
+from beaverhabits.storage.flush import coalescer
+from beaverhabits.storage.storage import HabitListStamp, UserStorage
+
+
+def timestamp(value: datetime.datetime) -> float:
+    # SQLite returns naive UTC times
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return value.timestamp()
 
 
 class DatabasePersistentDict(observables.ObservableDict):
@@ -19,23 +28,39 @@ class DatabasePersistentDict(observables.ObservableDict):
         async def backup():
             await crud.update_user_habit_list(self.user, self)
 
-        if core.loop:
-            background_tasks.create_lazy(backup(), name=self.user.email)
-        else:
-            core.app.on_startup(backup())
+        coalescer.schedule(self.user.email, backup)
 
 
 class UserDatabaseStorage(UserStorage[DictHabitList]):
+    def __init__(
+        self, encoding: RecordEncoding = settings.HABITS_RECORD_ENCODING
+    ) -> None:
+        self.encoding = encoding
+
     async def get_user_habit_list(self, user: User) -> Optional[DictHabitList]:
         user_habit_list = await crud.get_user_habit_list(user)
         if user_habit_list is None:
             return None
 
-        d = DatabasePersistentDict(user, user_habit_list.data)
-        return DictHabitList(d)
+        data = DictHabitList(user_habit_list.data).encoded(self.encoding)
+        d = DatabasePersistentDict(user, data)
+        habit_list = DictHabitList(d)
+        if user_habit_list.updated_at is not None:
+            habit_list.modified_at = timestamp(user_habit_list.updated_at)
+        if user_habit_list.content_hash is not None:
+            habit_list.etag_base = user_habit_list.content_hash
+        return habit_list
 
     async def save_user_habit_list(self, user: User, habit_list: DictHabitList) -> None:
-        await crud.update_user_habit_list(user, habit_list.data)
+        await crud.update_user_habit_list(user, habit_list.encoded(self.encoding))
+
+    async def get_user_habit_list_stamp(self, user: User) -> Optional[HabitListStamp]:
+        version = await crud.get_user_habit_list_version(user)
+        if version is None or None in version:
+            return None
+
+        content_hash, updated_at = version
+        return HabitListStamp.of(content_hash, 0, timestamp(updated_at))  # type: ignore
 
     async def merge_user_habit_list(
         self, user: User, other: DictHabitList
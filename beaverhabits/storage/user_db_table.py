@@ -0,0 +1,140 @@
+import datetime
+from dataclasses import dataclass, field
+from typing import ClassVar, Optional
+
+from nicegui import background_tasks, core
+
+from beaverhabits.app import crud
+from beaverhabits.app.db import User
+from beaverhabits.storage.dict import DAY_MASK, DictHabit, DictHabitList
+from beaverhabits.storage.storage import UserStorage
+
+# Marks a legacy JSON habit list whose habits live in the habit tables
+MIGRATED_KEY = "migrated"
+
+
+@dataclass
+class DatabaseHabit(DictHabit):
+    """DictHabit whose changes are written as single rows
+
+    Ticks upsert one `habit_record` row, name and star changes update one
+    `habit` row.
+    """
+
+    @property
+    def habit_list(self) -> "DatabaseHabitList":
+        return self._habit_list  # type: ignore
+
+    @DictHabit.name.setter
+    def name(self, value: str) -> None:
+        DictHabit.name.fset(self, value)  # type: ignore
+        self._backup()
+
+    @DictHabit.star.setter
+    def star(self, value: int) -> None:
+        DictHabit.star.fset(self, value)  # type: ignore
+        self._backup()
+
+    def _backup(self) -> None:
+        user = self.habit_list.user
+        coroutine = crud.update_user_habit(
+            user, self.id, name=self.name, star=bool(self.star)
+        )
+        if core.loop:
+            background_tasks.create_lazy(coroutine, name=f"{user.email}-{self.id}")
+        else:
+            core.app.on_startup(coroutine)
+
+    async def tick_many(self, changes: dict[datetime.date, bool]) -> None:
+        await super().tick_many(changes)
+        if changes:
+            habit_pk = self.habit_list.pks[self.id]
+            await crud.upsert_habit_records(habit_pk, list(changes.items()))
+
+
+@dataclass
+class DatabaseHabitList(DictHabitList):
+    habit_class: ClassVar[type[DictHabit]] = DatabaseHabit
+
+    user: Optional[User] = None
+    # Habit id -> primary key of the habit row
+    pks: dict[str, int] = field(default_factory=dict)
+
+    async def add(self, name: str) -> None:
+        await super().add(name)
+        d = self.data["habits"][-1]
+        self.pks[d["id"]] = await crud.upsert_user_habit(
+            self.user, d["id"], d["name"], False  # type: ignore
+        )
+
+    async def remove(self, item: DictHabit) -> None:
+        await super().remove(item)
+        await crud.remove_user_habits(self.user, [item.id])  # type: ignore
+        self.pks.pop(item.id, None)
+
+
+class UserTableDatabaseStorage(UserStorage[DictHabitList]):
+    """Habits and records stored as rows of the habit and habit_record tables
+
+    A user's legacy JSON habit list is migrated on first load and kept,
+    marked as migrated, as the list header.
+    """
+
+    async def get_user_habit_list(self, user: User) -> Optional[DictHabitList]:
+        habits = await crud.get_user_habits(user)
+        if not habits:
+            habit_list = await crud.get_user_habit_list(user)
+            if habit_list is None:
+                return None
+            if not habit_list.data.get(MIGRATED_KEY):
+                await self._migrate(user, habit_list.data)
+                habits = await crud.get_user_habits(user)
+
+        records: dict[int, list[dict]] = {habit.id: [] for habit in habits}
+        for record in await crud.get_user_habit_records(user):
+            d = {"day": record.day.strftime(DAY_MASK), "done": record.done}
+            records[record.habit_id].append(d)
+
+        d = {
+            "habits": [
+                {
+                    "id": habit.uid,
+                    "name": habit.name,
+                    "star": habit.star,
+                    "records": records[habit.id],
+                }
+                for habit in habits
+            ]
+        }
+        pks = {habit.uid: habit.id for habit in habits}
+        return DatabaseHabitList(d, user, pks)
+
+    async def _migrate(self, user: User, data: dict) -> None:
+        await self._save_habits(user, DictHabitList(data))
+        await crud.update_user_habit_list(user, {**data, MIGRATED_KEY: True})
+
+    async def _save_habits(self, user: User, habit_list: DictHabitList) -> None:
+        uids = {habit.id for habit in habit_list.habits}
+        removed = [h.uid for h in await crud.get_user_habits(user) if h.uid not in uids]
+        await crud.remove_user_habits(user, removed)
+
+        for habit in habit_list.habits:
+            habit_pk = await crud.upsert_user_habit(
+                user, habit.id, habit.name, bool(habit.star)
+            )
+            records = [(r.day, r.done) for r in habit.records]
+            await crud.upsert_habit_records(habit_pk, records)
+
+    async def save_user_habit_list(self, user: User, habit_list: DictHabitList) -> None:
+        await self._save_habits(user, habit_list)
+        if await crud.get_user_habit_list(user) is None:
+            await crud.update_user_habit_list(user, {"habits": [], MIGRATED_KEY: True})
+
+    async def merge_user_habit_list(
+        self, user: User, other: DictHabitList
+    ) -> DictHabitList:
+        current = await self.get_user_habit_list(user)
+        if current is None:
+            return other
+
+        return await current.merge(other)
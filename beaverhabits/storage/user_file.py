@@ -1,31 +1,90 @@
+import json
+import weakref
 from pathlib import Path
 from typing import Optional
 
+import aiofiles
 from nicegui.storage import PersistentDict
 
 from beaverhabits.app.db import User
-from beaverhabits.configs import USER_DATA_FOLDER
+from beaverhabits.configs import USER_DATA_FOLDER, RecordEncoding, settings
+from beaverhabits.logging import logger
+from beaverhabits.storage.cache import LRUCache
 from beaverhabits.storage.dict import DictHabitList
+from beaverhabits.storage.flush import coalescer
 from beaverhabits.storage.storage import UserStorage
 
 KEY_NAME = "data"
 
 
+class UserPersistentDict(PersistentDict):
+    """PersistentDict tracking unsaved changes and its size on disk"""
+
+    def __init__(self, filepath: Path) -> None:
+        self.dirty = False
+        super().__init__(filepath, encoding="utf-8")
+        self.size = filepath.stat().st_size if filepath.exists() else 0
+
+    def backup(self) -> None:
+        self.dirty = True
+        coalescer.schedule(self.filepath.stem, self.flush)
+
+    async def flush(self) -> None:
+        if not self.dirty:
+            return
+
+        self.dirty = False
+        content = json.dumps(self)
+        self.filepath.parent.mkdir(exist_ok=True)
+        async with aiofiles.open(self.filepath, "w", encoding=self.encoding) as f:
+            await f.write(content)
+        self.size = len(content)
+
+
 class UserDiskStorage(UserStorage[DictHabitList]):
+    def __init__(
+        self,
+        encoding: RecordEncoding = settings.HABITS_RECORD_ENCODING,
+        max_entries: int = settings.HABITS_DISK_CACHE_ENTRIES,
+        max_bytes: int = settings.HABITS_DISK_CACHE_BYTES,
+    ) -> None:
+        self.encoding = encoding
+        self.cache: LRUCache[str, UserPersistentDict] = LRUCache(max_entries, max_bytes)
+        # Evicted dicts still used by a page, so that a file has one writer
+        self.live: weakref.WeakValueDictionary[str, UserPersistentDict] = (
+            weakref.WeakValueDictionary()
+        )
 
-    def _get_persistent_dict(self, user: User) -> PersistentDict:
+    async def _get_persistent_dict(self, user: User) -> UserPersistentDict:
         path = Path(f"{USER_DATA_FOLDER}/{str(user.email)}.json")
-        return PersistentDict(path, encoding="utf-8")
+        if (d := self.cache.get(str(path))) is not None:
+            self.cache.resize(str(path), d.size)
+            return d
+
+        if (d := self.live.get(str(path))) is None:
+            d = self.live[str(path)] = UserPersistentDict(path)
+        for _, evicted in self.cache.put(str(path), d, d.size):
+            await evicted.flush()
+        logger.info(f"[Cache] User disk cache {self.cache.stats()}")
+        return d
 
     async def get_user_habit_list(self, user: User) -> Optional[DictHabitList]:
-        d = self._get_persistent_dict(user).get(KEY_NAME)
+        persistent_dict = await self._get_persistent_dict(user)
+        d = persistent_dict.get(KEY_NAME)
         if not d:
             return None
+
+        # Migrate records to the configured encoding
+        encoded = DictHabitList(d).encoded(self.encoding)
+        if encoded is not d:
+            persistent_dict[KEY_NAME] = encoded
+            d = persistent_dict[KEY_NAME]
+
         return DictHabitList(d)
 
     async def save_user_habit_list(self, user: User, habit_list: DictHabitList) -> None:
-        d = self._get_persistent_dict(user)
-        d[KEY_NAME] = habit_list.data
+        d = await self._get_persistent_dict(user)
+        d[KEY_NAME] = habit_list.encoded(self.encoding)
 
     async def merge_user_habit_list(
         self, user: User, other: DictHabitList
@@ -0,0 +1,251 @@
+import asyncio
+import datetime
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import ClassVar, Iterable, Optional, Sequence
+
+from beaverhabits.app.db import User
+from beaverhabits.configs import USER_DATA_FOLDER, RecordEncoding, settings
+from beaverhabits.logging import logger
+from beaverhabits.storage.dict import DAY_MASK, DictHabit, DictHabitList
+from beaverhabits.storage.flush import coalescer
+from beaverhabits.storage.storage import UserStorage
+from beaverhabits.storage.user_file import KEY_NAME
+
+# Journal operations, one JSON array per line, e.g. ["t","3f2a1b","2024-05-01",true]
+TICK, NAME, STAR, ADD, REMOVE = "t", "n", "s", "a", "r"
+
+
+def read_files(snapshot: Path, log: Path) -> tuple[Optional[dict], list[list]]:
+    data = None
+    if snapshot.exists():
+        data = json.loads(snapshot.read_text(encoding="utf-8")).get(KEY_NAME)
+
+    ops = []
+    if log.exists():
+        for line in log.read_text(encoding="utf-8").splitlines():
+            try:
+                ops.append(json.loads(line))
+            except json.JSONDecodeError:
+                # Torn write of the last line before a crash
+                logger.warning(f"[Journal] {log} skipped line: {line}")
+                break
+    return data, ops
+
+
+def write_snapshot(snapshot: Path, log: Path, data: dict) -> None:
+    snapshot.parent.mkdir(exist_ok=True)
+    tmp = snapshot.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({KEY_NAME: data}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, snapshot)
+    # Ops are idempotent, replaying them on the new snapshot is harmless
+    log.unlink(missing_ok=True)
+
+
+async def replay(habit_list: DictHabitList, ops: list[list]) -> None:
+    for kind, *args in ops:
+        if kind == ADD:
+            if await habit_list.get_habit_by(args[0]["id"]) is None:
+                habit_list.data["habits"].append(args[0])
+            continue
+
+        habit = await habit_list.get_habit_by(args[0])
+        if habit is None:
+            continue
+        if kind == TICK:
+            day = datetime.datetime.strptime(args[1], DAY_MASK).date()
+            await habit.tick(day, args[2])
+        elif kind == NAME:
+            habit.name = args[1]
+        elif kind == STAR:
+            habit.star = args[1]
+        elif kind == REMOVE:
+            await habit_list.remove(habit)
+
+
+class Journal:
+    """Snapshot file plus an append-only log of habit operations
+
+    Each op is written to the log as it happens, a few bytes with O_APPEND,
+    so it survives a crash of the app. The fsyncs are batched by the write
+    coalescer, so ops may stay unsynced for up to HABITS_FLUSH_MAX_DELAY_MS
+    if the whole machine goes down.
+
+    The log is compacted into the snapshot once it holds
+    HABITS_JOURNAL_COMPACT_OPS ops. Ops appended while the snapshot is
+    rewritten are held in memory and go to the new log right after.
+    """
+
+    def __init__(self, name: str, encoding: RecordEncoding) -> None:
+        self.name = name
+        self.snapshot = Path(f"{USER_DATA_FOLDER}/{name}.json")
+        self.log = Path(f"{USER_DATA_FOLDER}/{name}.log")
+        self.encoding = encoding
+
+        self.fd: Optional[int] = None
+        self.unsynced = False
+        self.rotating = False
+        self.buffer: list[str] = []
+        self.log_ops = 0
+        self.lock = asyncio.Lock()
+
+    def append(self, *op) -> None:
+        self.extend([op])
+
+    def extend(self, ops: Iterable[Sequence]) -> None:
+        lines = [json.dumps(op, separators=(",", ":")) for op in ops]
+        if self.rotating:
+            self.buffer.extend(lines)
+        else:
+            self._write(lines)
+        coalescer.schedule(self.name, self.flush)
+
+    def _write(self, lines: list[str]) -> None:
+        if self.fd is None:
+            self.log.parent.mkdir(exist_ok=True)
+            self.fd = os.open(self.log, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        os.write(self.fd, "".join(f"{line}\n" for line in lines).encode("utf-8"))
+        self.log_ops += len(lines)
+        self.unsynced = True
+
+    def _close(self) -> None:
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    async def flush(self) -> None:
+        async with self.lock:
+            await self._flush()
+
+    async def _flush(self) -> None:
+        if self.fd is not None and self.unsynced:
+            self.unsynced = False
+            await asyncio.to_thread(os.fsync, self.fd)
+
+        if self.log_ops >= settings.HABITS_JOURNAL_COMPACT_OPS:
+            log_ops = self.log_ops
+            await self._rotate(None)
+            logger.info(f"[Journal] {self.name} compacted {log_ops} ops")
+
+    async def _rotate(self, data: Optional[dict]) -> None:
+        """Write a snapshot of `data`, or of the replayed log, and a new log"""
+        self.rotating = True
+        try:
+            self._close()
+            if data is None:
+                data = await self._load()
+            if data is not None:
+                await self._save(data)
+        finally:
+            self.rotating = False
+            lines, self.buffer = self.buffer, []
+            if lines:
+                self._write(lines)
+                coalescer.schedule(self.name, self.flush)
+
+    async def _load(self) -> Optional[dict]:
+        data, ops = await asyncio.to_thread(read_files, self.snapshot, self.log)
+        self.log_ops = len(ops)
+        if data is None:
+            return None
+
+        habit_list = DictHabitList(data)
+        await replay(habit_list, ops)
+        return habit_list.encoded(self.encoding)
+
+    async def _save(self, data: dict) -> None:
+        await asyncio.to_thread(write_snapshot, self.snapshot, self.log, data)
+        self.log_ops = 0
+
+    async def load(self) -> Optional[dict]:
+        async with self.lock:
+            await self._flush()
+            return await self._load()
+
+    async def save(self, data: dict) -> None:
+        async with self.lock:
+            await self._rotate(data)
+
+
+@dataclass
+class JournalHabit(DictHabit):
+    @property
+    def journal(self) -> Journal:
+        return self._habit_list.journal  # type: ignore
+
+    @DictHabit.name.setter
+    def name(self, value: str) -> None:
+        DictHabit.name.fset(self, value)  # type: ignore
+        self.journal.append(NAME, self.id, value)
+
+    @DictHabit.star.setter
+    def star(self, value: int) -> None:
+        DictHabit.star.fset(self, value)  # type: ignore
+        self.journal.append(STAR, self.id, value)
+
+    async def tick_many(self, changes: dict[datetime.date, bool]) -> None:
+        await super().tick_many(changes)
+        self.journal.extend(
+            [TICK, self.id, day.strftime(DAY_MASK), done]
+            for day, done in changes.items()
+        )
+
+
+@dataclass
+class JournalHabitList(DictHabitList):
+    habit_class: ClassVar[type[DictHabit]] = JournalHabit
+
+    journal: Optional[Journal] = None
+
+    async def add(self, name: str) -> None:
+        await super().add(name)
+        self.journal.append(ADD, dict(self.data["habits"][-1]))  # type: ignore
+
+    async def remove(self, item: DictHabit) -> None:
+        await super().remove(item)
+        self.journal.append(REMOVE, item.id)  # type: ignore
+
+
+class UserJournalDiskStorage(UserStorage[DictHabitList]):
+    """Disk storage writing a few bytes of journal per change
+
+    Uses the same snapshot file as `UserDiskStorage`, next to a `.log`
+    journal replayed on load.
+    """
+
+    def __init__(
+        self, encoding: RecordEncoding = settings.HABITS_RECORD_ENCODING
+    ) -> None:
+        self.encoding = encoding
+        self.journals: dict[str, Journal] = {}
+
+    def _get_journal(self, user: User) -> Journal:
+        name = str(user.email)
+        if name not in self.journals:
+            self.journals[name] = Journal(name, self.encoding)
+        return self.journals[name]
+
+    async def get_user_habit_list(self, user: User) -> Optional[DictHabitList]:
+        journal = self._get_journal(user)
+        d = await journal.load()
+        if not d:
+            return None
+        return JournalHabitList(d, journal)
+
+    async def save_user_habit_list(self, user: User, habit_list: DictHabitList) -> None:
+        journal = self._get_journal(user)
+        await journal.save(habit_list.encoded(self.encoding))
+
+    async def merge_user_habit_list(
+        self, user: User, other: DictHabitList
+    ) -> DictHabitList:
+        current = await self.get_user_habit_list(user)
+        if current is None:
+            return other
+
+        return await current.merge(other)
@@ -1,16 +1,13 @@
 import datetime
-import json
 import random
-import time
 from typing import List
 
 from fastapi import HTTPException
-from nicegui import ui
 
 from beaverhabits.app.db import User
 from beaverhabits.storage import get_user_dict_storage, session_storage
 from beaverhabits.storage.dict import DAY_MASK, DictHabitList
-from beaverhabits.storage.storage import Habit, HabitList
+from beaverhabits.storage.storage import Habit, HabitList, HabitListStamp
 from beaverhabits.utils import generate_short_hash
 
 user_storage = get_user_dict_storage()
@@ -60,6 +57,10 @@ async def get_user_habit_list(user: User) -> HabitList | None:
     return await user_storage.get_user_habit_list(user)
 
 
+async def get_user_habit_list_stamp(user: User) -> HabitListStamp | None:
+    return await user_storage.get_user_habit_list_stamp(user)
+
+
 async def get_user_habit(user: User, habit_id: str) -> Habit:
     habit_list = await get_user_habit_list(user)
     if habit_list is None:
@@ -82,18 +83,3 @@ async def get_or_create_user_habit_list(
     habit_list = dummy_habit_list(days)
     await user_storage.save_user_habit_list(user, habit_list)
     return habit_list
-
-
-async def export_user_habit_list(habit_list: HabitList, user_identify: str) -> None:
-    # json to binary
-    if isinstance(habit_list, DictHabitList):
-        data = {
-            "user_email": user_identify,
-            "exported_at": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            **habit_list.data,
-        }
-        binary_data = json.dumps(data).encode()
-        file_name = f"habits_{int(float(time.time()))}.json"
-        ui.download(binary_data, file_name)
-    else:
-        ui.notification("Export failed, please try again later.")
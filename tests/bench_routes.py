@@ -0,0 +1,49 @@
+"""Per-request overhead of the route checks in AuthMiddleware
+
+Run with `python -m tests.bench_routes`.
+"""
+
+import timeit
+
+from fastapi.routing import APIRoute
+from nicegui import app
+
+from beaverhabits.main import app as _  # noqa: F401 register routes
+from beaverhabits.routes import (
+    UNRESTRICTED_PAGE_ROUTES,
+    RouteKind,
+    RouteTable,
+    set_authorization,
+)
+
+PATHS = ["/gui", "/gui/habits/abc", "/login", "/_nicegui/1.4.37/static/x.js"]
+HEADERS = [(b"host", b"localhost"), (b"cookie", b"id=1"), (b"accept", b"*/*")]
+NUMBER = 20000
+
+
+def rebuild_per_request(path: str) -> None:
+    client_page_routes = [
+        route.path for route in app.routes if isinstance(route, APIRoute)
+    ]
+    _ = path in client_page_routes and path not in UNRESTRICTED_PAGE_ROUTES
+    headers = [e for e in HEADERS if not e[0] == b"authorization"]
+    headers.append((b"authorization", b"Bearer token"))
+
+
+def route_table(table: RouteTable, path: str) -> None:
+    _ = table.classify(path) == RouteKind.PROTECTED
+    set_authorization(list(HEADERS), b"Bearer token")
+
+
+def main() -> None:
+    table = RouteTable.compile(app.routes)
+    for name, func in [
+        ("rebuild per request", lambda p: rebuild_per_request(p)),
+        ("route table", lambda p: route_table(table, p)),
+    ]:
+        seconds = timeit.timeit(lambda: [func(p) for p in PATHS], number=NUMBER)
+        print(f"{name}: {seconds / NUMBER / len(PATHS) * 1e6:.2f} us/request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+import datetime
+import uuid
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from nicegui.observables import ObservableDict
+
+from beaverhabits import views
+from beaverhabits.app import auth
+from beaverhabits.app.api import init_api_routes
+from beaverhabits.app.db import User
+from beaverhabits.app.users import current_active_user
+from beaverhabits.storage.dict import DictHabitList
+from beaverhabits.storage.flush import coalescer
+from beaverhabits.storage.storage import UserStorage
+from beaverhabits.storage.user_db import UserDatabaseStorage
+
+from .test_auth import database  # noqa: F401
+from .test_cache import loop  # noqa: F401
+from .test_storage import dummy_days, dummy_habit
+
+
+class MemoryStorage(UserStorage[DictHabitList]):
+    def __init__(self, habit_list: DictHabitList) -> None:
+        self.habit_list = habit_list
+
+    async def get_user_habit_list(self, user: User) -> DictHabitList:
+        return self.habit_list
+
+
+@pytest.fixture
+def habit_list(monkeypatch) -> DictHabitList:
+    days = dummy_days(5)
+    habits = [dummy_habit(days[:3]).data, {"id": "2", "name": "b", "records": []}]
+    habit_list = DictHabitList({"habits": habits})
+    monkeypatch.setattr(views, "user_storage", MemoryStorage(habit_list))
+    return habit_list
+
+
+def api_client() -> httpx.AsyncClient:
+    test_app = FastAPI()
+    init_api_routes(test_app)
+    user = User(id=uuid.uuid4(), email="test@example.com", is_active=True)
+    test_app.dependency_overrides[current_active_user] = lambda: user
+
+    transport = httpx.ASGITransport(app=test_app)  # type: ignore
+    return httpx.AsyncClient(transport=transport, base_url="http://t/api/v1")
+
+
+@pytest.mark.asyncio
+async def test_api_read(habit_list):
+    days = dummy_days(5)
+    async with api_client() as client:
+        response = await client.get("/habits")
+        assert response.json() == [
+            {"id": "1", "name": "habit", "star": False},
+            {"id": "2", "name": "b", "star": False},
+        ]
+
+        response = await client.get("/habits/1/records")
+        assert [r["day"] for r in response.json()] == [str(d) for d in days[:3]]
+
+        params = {"from": str(days[1]), "to": str(days[4])}
+        response = await client.get("/habits/1/records", params=params)
+        assert response.json() == [{"day": str(d), "done": True} for d in days[1:3]]
+
+        response = await client.get("/habits/1/records", params={"to": str(days[0])})
+        assert len(response.json()) == 1
+
+        response = await client.get("/habits/3/records")
+        assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_api_ticks(habit_list):
+    days = dummy_days(5)
+    habit = habit_list.habits[0]
+    changes = []
+    habit.subscribe(lambda day, done: changes.append((day, done)))
+
+    ticks = [
+        {"habit_id": "1", "day": str(days[0]), "done": False},
+        {"habit_id": "1", "day": str(days[4]), "done": True},
+        {"habit_id": "2", "day": str(days[4]), "done": True},
+    ]
+    async with api_client() as client:
+        response = await client.post("/ticks", json={"ticks": ticks})
+        assert response.json() == {"ticked": 3}
+
+        # Nothing is applied when a habit is unknown
+        unknown = {"habit_id": "3", "day": str(days[1]), "done": False}
+        invalid = [{**ticks[0], "day": str(days[1])}, unknown]
+        response = await client.post("/ticks", json={"ticks": invalid})
+        assert response.status_code == 404
+
+    assert habit.ticked_days == days[1:3] + [days[4]]
+    assert habit_list.habits[1].ticked_days == [days[4]]
+    assert changes == [(days[0], False), (days[4], True)]
+
+
+@pytest.mark.asyncio
+async def test_api_not_modified(habit_list):
+    days = dummy_days(5)
+    async with api_client() as client:
+        response = await client.get("/habits")
+        etag = response.headers["etag"]
+        assert etag == habit_list.stamp.etag
+
+        for path in ("/habits", "/habits/1/records"):
+            response = await client.get(path, headers={"if-none-match": etag})
+            assert response.status_code == 304
+            assert response.headers["etag"] == etag
+
+        await habit_list.habits[1].tick(days[0], True)
+        response = await client.get("/habits", headers={"if-none-match": etag})
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+
+
+@pytest.mark.asyncio
+async def test_database_stamp(database, loop):
+    storage = UserDatabaseStorage()
+    user = await auth.user_create("test@example.com", "password")
+    assert await storage.get_user_habit_list_stamp(user) is None  # type: ignore
+
+    days = dummy_days(3)
+    await storage.save_user_habit_list(user, DictHabitList({"habits": [dummy_habit(days).data]}))  # type: ignore
+    habit_list = await storage.get_user_habit_list(user)  # type: ignore
+
+    # Checked without loading the habit list data
+    database.clear()
+    stamp = await storage.get_user_habit_list_stamp(user)  # type: ignore
+    assert stamp == habit_list.stamp  # type: ignore
+    assert not any("habit_list.data" in q for q in database)
+
+    await habit_list.habits[0].tick(days[0], False)  # type: ignore
+    assert habit_list.stamp.etag != stamp.etag  # type: ignore
+
+
+@pytest.mark.asyncio
+async def test_api_ticks_single_write(loop, monkeypatch):
+    monkeypatch.setattr(coalescer, "interval", 0)
+    writes = []
+
+    async def write():
+        writes.append(len(writes))
+
+    days = dummy_days(2)
+    habits = [dummy_habit([]).data, {"id": "2", "name": "b", "records": []}]
+    data = ObservableDict(
+        {"habits": habits},
+        on_change=lambda: coalescer.schedule("test@example.com", write),
+    )
+    monkeypatch.setattr(views, "user_storage", MemoryStorage(DictHabitList(data)))
+
+    ticks = [
+        {"habit_id": habit_id, "day": str(day), "done": True}
+        for habit_id in ("1", "2")
+        for day in days
+    ]
+    async with api_client() as client:
+        response = await client.post("/ticks", json={"ticks": ticks})
+        assert response.json() == {"ticked": 4}
+
+    await coalescer.flush_all()
+    assert writes == [0]
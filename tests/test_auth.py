@@ -0,0 +1,170 @@
+import contextlib
+import uuid
+
+import httpx
+import pytest
+import pytest_asyncio
+from fastapi import Depends, FastAPI, Request
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from beaverhabits.app import auth, db
+from beaverhabits.app.db import User
+from beaverhabits.app.users import current_active_user, get_jwt_strategy
+
+
+class FakeUserManager:
+    def __init__(self, users: dict[uuid.UUID, User]) -> None:
+        self.users = users
+        self.gets = 0
+
+    def parse_id(self, value) -> uuid.UUID:
+        return uuid.UUID(value)
+
+    async def get(self, user_id: uuid.UUID) -> User:
+        self.gets += 1
+        return self.users[user_id]
+
+
+@pytest.fixture
+def user_manager(monkeypatch):
+    user = User(id=uuid.uuid4(), email="test@example.com", is_active=True)
+    manager = FakeUserManager({user.id: user})
+
+    @contextlib.asynccontextmanager
+    async def context(*args):
+        yield manager
+
+    monkeypatch.setattr(auth, "get_async_session_context", context)
+    monkeypatch.setattr(auth, "get_user_db_context", context)
+    monkeypatch.setattr(auth, "get_user_manager_context", context)
+    auth.token_cache.entries.clear()
+    yield manager
+    auth.token_cache.entries.clear()
+
+
+@pytest.mark.asyncio
+async def test_verified_token_cache(user_manager):
+    user = next(iter(user_manager.users.values()))
+    token = await get_jwt_strategy().write_token(user)
+
+    assert await auth.user_check_token(token)
+    assert await auth.user_check_token(token)
+    assert user_manager.gets == 1
+
+    assert not await auth.user_check_token(token + "x")
+    assert not await auth.user_check_token(None)
+
+    # Evicted tokens are verified again
+    auth.token_cache.pop(auth.token_digest(token))
+    user.is_active = False
+    assert not await auth.user_check_token(token)
+    assert user_manager.gets == 2
+
+
+@pytest.mark.asyncio
+async def test_stateless_token_check(user_manager, monkeypatch):
+    monkeypatch.setattr(auth.settings, "AUTH_STATELESS", True)
+    user = next(iter(user_manager.users.values()))
+    token = await get_jwt_strategy().write_token(user)
+
+    assert await auth.user_check_token(token)
+    assert not await auth.user_check_token("invalid")
+    assert user_manager.gets == 0
+
+
+@pytest_asyncio.fixture
+async def database(tmp_path, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/habits.db")
+    monkeypatch.setattr(db, "engine", engine)
+    monkeypatch.setattr(
+        db, "async_session_maker", async_sessionmaker(engine, expire_on_commit=False)
+    )
+    await db.create_db_and_tables()
+
+    queries = []
+    listener = lambda *args: queries.append(args[2])  # noqa: E731
+    event.listen(engine.sync_engine, "before_cursor_execute", listener)
+    auth.token_cache.entries.clear()
+    yield queries
+    event.remove(engine.sync_engine, "before_cursor_execute", listener)
+    auth.token_cache.entries.clear()
+    await engine.dispose()
+
+
+def page_app(dependency) -> FastAPI:
+    test_app = FastAPI()
+
+    @test_app.middleware("http")
+    async def middleware(request: Request, call_next):
+        token = request.headers["authorization"].removeprefix("Bearer ")
+        await auth.user_authenticate_request(request.scope, token)
+        return await call_next(request)
+
+    @test_app.get("/page")
+    async def page(user: User = Depends(dependency)):
+        return user.email
+
+    return test_app
+
+
+async def get_page(test_app: FastAPI, token: str) -> httpx.Response:
+    transport = httpx.ASGITransport(app=test_app)  # type: ignore
+    async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+        return await client.get("/page", headers={"authorization": f"Bearer {token}"})
+
+
+@pytest.mark.asyncio
+async def test_page_user_resolved_once(database):
+    user = await auth.user_create("test@example.com", "password")
+    token = await auth.user_create_token(user)  # type: ignore
+
+    def user_queries() -> int:
+        return sum("FROM user" in q for q in database)
+
+    # Middleware check plus current_active_user
+    database.clear()
+    response = await get_page(page_app(current_active_user), token)  # type: ignore
+    assert response.json() == "test@example.com"
+    assert user_queries() == 2
+
+    # Middleware user reused by the page
+    auth.token_cache.entries.clear()
+    database.clear()
+    response = await get_page(page_app(auth.current_page_user), token)  # type: ignore
+    assert response.json() == "test@example.com"
+    assert user_queries() == 1
+
+    database.clear()
+    response = await get_page(page_app(auth.current_page_user), token)  # type: ignore
+    assert response.json() == "test@example.com"
+    assert user_queries() == 0
+
+
+@pytest.mark.asyncio
+async def test_stateless_page_user(database, monkeypatch):
+    monkeypatch.setattr(auth.settings, "AUTH_STATELESS", True)
+    user = await auth.user_create("test@example.com", "password")
+    token = await auth.user_create_token(user)  # type: ignore
+
+    decodes = []
+    decode_token = auth.decode_token
+    monkeypatch.setattr(
+        auth, "decode_token", lambda t: decodes.append(t) or decode_token(t)
+    )
+
+    def user_queries() -> int:
+        return sum("FROM user" in q for q in database)
+
+    # Token decoded once by the middleware, user loaded once by the page
+    database.clear()
+    response = await get_page(page_app(auth.current_page_user), token)  # type: ignore
+    assert response.json() == "test@example.com"
+    assert user_queries() == 1
+    assert len(decodes) == 1
+
+    database.clear()
+    response = await get_page(page_app(auth.current_page_user), token)  # type: ignore
+    assert response.json() == "test@example.com"
+    assert user_queries() == 0
+    assert len(decodes) == 2
@@ -0,0 +1,116 @@
+import asyncio
+import datetime
+import json
+
+import pytest
+import pytest_asyncio
+from nicegui import core
+
+from beaverhabits.app.db import User
+from beaverhabits.storage.cache import CachedUserStorage, LRUCache
+from beaverhabits.storage.flush import coalescer
+from beaverhabits.storage.storage import ChangeKind, HabitListChange
+from beaverhabits.storage.user_file import UserDiskStorage
+from beaverhabits.views import dummy_habit_list
+
+
+@pytest_asyncio.fixture
+async def loop(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    core.loop = asyncio.get_running_loop()
+    yield core.loop
+    await coalescer.flush_all()
+    core.loop = None
+
+
+def test_lru_cache():
+    cache = LRUCache(max_entries=2, max_bytes=10)
+    assert cache.put("a", 1, 4) == []
+    assert cache.put("b", 2, 4) == []
+    assert cache.get("a") == 1
+
+    assert cache.put("c", 3, 4) == [("b", 2)]
+    assert cache.put("d", 4, 8) == [("a", 1), ("c", 3)]
+    assert cache.get("b") is None
+    assert cache.stats() == {
+        "entries": 1,
+        "bytes": 8,
+        "hits": 1,
+        "misses": 1,
+        "evictions": 3,
+    }
+
+
+def test_lru_cache_ttl():
+    cache = LRUCache(max_entries=2, ttl=-1)
+    cache.put("a", 1)
+    assert cache.get("a") is None
+    assert "a" not in cache
+
+
+@pytest.mark.asyncio
+async def test_cached_user_storage(loop):
+    storage = CachedUserStorage(UserDiskStorage(), max_entries=2, ttl=60)
+    user = User(email="a@b.c")
+    day = datetime.date(2024, 5, 1)
+    assert await storage.get_user_habit_list(user) is None
+
+    await storage.save_user_habit_list(user, dummy_habit_list([day]))
+    habit_list = await storage.get_user_habit_list(user)
+    assert await storage.get_user_habit_list(user) is habit_list
+
+    # Pages keep sharing a saved list, a replaced one tells them to reload
+    changes = []
+    habit_list.subscribe(changes.append)
+    await storage.save_user_habit_list(user, habit_list)
+    assert await storage.get_user_habit_list(user) is habit_list
+    assert changes == []
+
+    await storage.save_user_habit_list(user, dummy_habit_list([day]))
+    assert await storage.get_user_habit_list(user) is not habit_list
+    assert changes == [HabitListChange(ChangeKind.RELOAD)]
+    assert (storage.cache.hits, storage.cache.misses) == (1, 4)
+
+
+@pytest.mark.asyncio
+async def test_cached_user_storage_shares_live_lists(loop):
+    storage = CachedUserStorage(UserDiskStorage(), max_entries=1, ttl=60)
+    user, other = User(email="a@b.c"), User(email="d@e.f")
+    day = datetime.date(2024, 5, 1)
+    await storage.save_user_habit_list(user, dummy_habit_list([day]))
+    await storage.save_user_habit_list(other, dummy_habit_list([day]))
+
+    # Evicted, but still used by a page
+    habit_list = await storage.get_user_habit_list(user)
+    await storage.get_user_habit_list(other)
+    assert user.email not in storage.cache
+    assert await storage.get_user_habit_list(user) is habit_list
+
+
+@pytest.mark.asyncio
+async def test_disk_storage_eviction_flush(loop, tmp_path):
+    storage = UserDiskStorage(max_entries=1)
+    day = datetime.date(2024, 5, 1)
+    user, other = User(email="a@b.c"), User(email="d@e.f")
+
+    await storage.save_user_habit_list(user, dummy_habit_list([day]))
+    habit_list = await storage.get_user_habit_list(user)
+    assert storage.cache.hits == 1
+
+    habit_list.habits[0].name = "Renamed"
+    await storage.get_user_habit_list(other)
+    assert storage.cache.evictions == 1
+
+    content = json.loads((tmp_path / ".user" / "a@b.c.json").read_text())
+    assert content["data"]["habits"][0]["name"] == "Renamed"
+
+    # Evicted while still used, the same dict is loaded again
+    loaded = await storage.get_user_habit_list(user)
+    assert loaded.data is habit_list.data
+    loaded.habits[0].name = "Loaded"
+    habit_list.habits[0].star = True
+    await coalescer.flush_all()
+
+    content = json.loads((tmp_path / ".user" / "a@b.c.json").read_text())
+    assert content["data"]["habits"][0]["name"] == "Loaded"
+    assert content["data"]["habits"][0]["star"] is True
@@ -0,0 +1,80 @@
+import uuid
+
+import pytest
+from sqlalchemy import inspect, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from beaverhabits.app import auth, crud, db
+
+from .test_auth import database  # noqa: F401
+
+
+@pytest.mark.asyncio
+async def test_update_user_habit_list(database):
+    user = await auth.user_create("test@example.com", "password")
+    data = {"habits": [{"id": "1", "name": "habit", "records": []}]}
+
+    await crud.update_user_habit_list(user, data)
+    habit_list = await crud.get_user_habit_list(user)
+    assert habit_list is not None
+    assert habit_list.version == 1
+    assert habit_list.content_hash == crud.content_hash(data)
+    updated_at = habit_list.updated_at
+
+    # Unchanged content is not written
+    await crud.update_user_habit_list(user, {**data})
+    habit_list = await crud.get_user_habit_list(user)
+    assert habit_list is not None
+    assert habit_list.version == 1 and habit_list.updated_at == updated_at
+
+    data = {"habits": [{"id": "1", "name": "renamed", "records": []}]}
+    await crud.update_user_habit_list(user, data)
+    habit_list = await crud.get_user_habit_list(user)
+    assert habit_list is not None
+    assert habit_list.version == 2 and habit_list.data == data
+
+
+@pytest.mark.asyncio
+async def test_migrate_habit_list_table(tmp_path, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/habits.db")
+    monkeypatch.setattr(db, "engine", engine)
+    monkeypatch.setattr(
+        db, "async_session_maker", async_sessionmaker(engine, expire_on_commit=False)
+    )
+
+    # habit_list as created by earlier versions, with duplicate lists
+    users = [uuid.uuid4().hex for _ in range(2)]
+    rows = [(users[0], "first"), (users[1], "other"), (users[0], "duplicate")]
+    async with engine.begin() as conn:
+        await conn.execute(
+            text(
+                "CREATE TABLE habit_list (id INTEGER PRIMARY KEY, data JSON NOT NULL, "
+                + "user_id CHAR(32), created_at DATETIME, updated_at DATETIME)"
+            )
+        )
+        await conn.execute(
+            text("CREATE INDEX ix_habit_list_user_id ON habit_list (user_id)")
+        )
+        for user_id, name in rows:
+            await conn.execute(
+                text("INSERT INTO habit_list (data, user_id) VALUES (:data, :user_id)"),
+                {"data": f'{{"name": "{name}"}}', "user_id": user_id},
+            )
+
+    await db.create_db_and_tables()
+    # Idempotent
+    await db.create_db_and_tables()
+
+    async with engine.connect() as conn:
+        result = await conn.execute(
+            text("SELECT user_id, data, version FROM habit_list ORDER BY id")
+        )
+        assert [tuple(row) for row in result] == [
+            (users[0], '{"name": "first"}', 0),
+            (users[1], '{"name": "other"}', 0),
+        ]
+        indexes = await conn.run_sync(lambda c: inspect(c).get_indexes("habit_list"))
+        assert {"name": "uq_habit_list_user_id", "unique": 1} in [
+            {"name": i["name"], "unique": i["unique"]} for i in indexes
+        ]
+    await engine.dispose()
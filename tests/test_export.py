@@ -0,0 +1,74 @@
+import email.utils
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+
+from beaverhabits.export import accepted_encoding, export_response
+from beaverhabits.storage.dict import DictHabitList
+
+from .test_storage import dummy_days, dummy_habit
+
+
+def export_app(habit_list: DictHabitList) -> FastAPI:
+    test_app = FastAPI()
+
+    @test_app.get("/export")
+    async def export(request: Request):
+        return export_response(request, habit_list, "test@example.com")
+
+    return test_app
+
+
+async def get_export(habit_list: DictHabitList, **headers) -> httpx.Response:
+    transport = httpx.ASGITransport(app=export_app(habit_list))  # type: ignore
+    async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+        return await client.get("/export", headers=headers)
+
+
+@pytest.mark.asyncio
+async def test_export_stream():
+    days = dummy_days(5)
+    habits = [dummy_habit(days[i:]).data for i in range(3)]
+    habit_list = DictHabitList({"habits": habits, "version": 1})
+
+    response = await get_export(habit_list, **{"accept-encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    data = response.json()
+    assert data["user_email"] == "test@example.com"
+    assert data["version"] == 1
+    assert data["habits"] == habits
+
+    response = await get_export(habit_list, **{"accept-encoding": "br, gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    # Decoded by the client
+    assert response.json()["habits"] == habits
+    assert response.num_bytes_downloaded < len(response.content)
+
+
+def test_accepted_encoding():
+    assert accepted_encoding("gzip, deflate") == "gzip"
+    assert accepted_encoding("gzip;q=0, deflate") is None
+    assert accepted_encoding("*") is not None
+    assert accepted_encoding("") is None
+
+
+@pytest.mark.asyncio
+async def test_export_not_modified():
+    days = dummy_days(3)
+    habit_list = DictHabitList({"habits": [dummy_habit(days).data]})
+    habit_list.modified_at -= 10
+
+    response = await get_export(habit_list)
+    last_modified = response.headers["last-modified"]
+    response = await get_export(habit_list, **{"if-modified-since": last_modified})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    habit = habit_list.habits[0]
+    await habit.tick(days[0], False)
+    response = await get_export(habit_list, **{"if-modified-since": last_modified})
+    assert response.status_code == 200
+    assert email.utils.parsedate_to_datetime(
+        response.headers["last-modified"]
+    ) > email.utils.parsedate_to_datetime(last_modified)
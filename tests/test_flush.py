@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+import pytest_asyncio
+from nicegui import core
+
+from beaverhabits.storage.flush import WriteCoalescer
+
+
+@pytest_asyncio.fixture
+async def loop():
+    core.loop = asyncio.get_running_loop()
+    yield core.loop
+    core.loop = None
+
+
+@pytest.mark.asyncio
+async def test_coalesce_burst(loop):
+    coalescer = WriteCoalescer(interval_ms=20, max_delay_ms=1000, max_pending=100)
+    writes = []
+
+    async def write():
+        writes.append(len(writes))
+
+    for _ in range(10):
+        coalescer.schedule("user", write)
+    assert writes == []
+
+    await asyncio.sleep(0.05)
+    assert writes == [0]
+    assert (coalescer.changes, coalescer.writes, coalescer.writes_saved) == (10, 1, 9)
+
+
+@pytest.mark.asyncio
+async def test_coalesce_bounds(loop):
+    coalescer = WriteCoalescer(interval_ms=1000, max_delay_ms=1000, max_pending=3)
+    writes = []
+
+    async def write():
+        writes.append(len(writes))
+
+    for _ in range(4):
+        coalescer.schedule("user", write)
+    await asyncio.sleep(0)
+    assert writes == [0]
+
+    await coalescer.flush_all()
+    assert writes == [0, 1]
+    assert not coalescer.pending and not coalescer.running
+
+
+@pytest.mark.asyncio
+async def test_coalesce_hold(loop):
+    coalescer = WriteCoalescer(interval_ms=0, max_delay_ms=0, max_pending=1)
+    writes = []
+
+    def write(key: str):
+        async def write():
+            writes.append(key)
+
+        return write
+
+    with coalescer.hold("user"):
+        for _ in range(3):
+            coalescer.schedule("user", write("user"))
+        # Other keys are not held
+        coalescer.schedule("other", write("other"))
+        await asyncio.sleep(0)
+        assert writes == ["other"]
+
+    await coalescer.flush_all()
+    assert writes == ["other", "user"]
+    assert (coalescer.changes, coalescer.writes) == (4, 2)
+    assert not coalescer.held
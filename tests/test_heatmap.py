@@ -0,0 +1,88 @@
+import calendar
+import dataclasses
+import datetime
+
+import pytest
+from nicegui import Client, binding, events, ui
+from nicegui.page import page
+
+from beaverhabits.frontend.components import CalendarCheckBox, CalendarHeatmap
+from beaverhabits.frontend.habit_page import habit_page
+from beaverhabits.frontend.heatmap import HabitHeatmap
+from beaverhabits.storage.dict import DAY_MASK, DictHabit
+
+
+@pytest.mark.asyncio
+async def test_heatmap_batched_ticks():
+    today = datetime.date(2024, 5, 1)
+    records = [{"day": today.strftime(DAY_MASK), "done": True}]
+    habit = DictHabit({"id": "1", "name": "habit", "records": records})
+    habit_calendar = CalendarHeatmap.build(today, 15)
+
+    client = Client(page("/"), request=None)
+    with client:
+        heatmap = HabitHeatmap(habit, habit_calendar)
+    start = habit_calendar.data[0][0]
+    assert heatmap.props["ticked"] == [(today - start).days]
+
+    args = [[0, True], [(today - start).days, False], [10_000, True], ["1", True]]
+    await heatmap._async_task(
+        events.GenericEventArguments(sender=heatmap, client=client, args=args)
+    )
+    assert habit.ticked_days == [start]
+    assert heatmap.props["ticked"] == [0]
+
+    # Malformed events are ignored
+    for args in ([[1, True, 2], [2], 3, [3, "yes"], [4, True]], {"0": True}, None):
+        await heatmap._async_task(
+            events.GenericEventArguments(sender=heatmap, client=client, args=args)
+        )
+    assert habit.ticked_days == [start, start + datetime.timedelta(days=4)]
+
+
+@pytest.mark.asyncio
+async def test_habit_page_push_updates():
+    today = datetime.date(2024, 5, 1)
+    habit = DictHabit({"id": "1", "name": "habit", "records": []})
+
+    active_links = len(binding.active_links)
+    client = Client(page("/"), request=None)
+    with client:
+        habit_page(today, habit)
+    assert len(binding.active_links) == active_links
+
+    await habit.tick(today, True)
+    date_input = next(e for e in client.elements.values() if isinstance(e, ui.date))
+    checkbox = next(
+        e
+        for e in client.elements.values()
+        if isinstance(e, CalendarCheckBox) and e.day == today
+    )
+    assert today.strftime(DAY_MASK) in date_input.value
+    assert checkbox.value is True
+
+    client.remove_all_elements()
+    assert habit._listeners == []
+
+
+def test_calendar_memoized():
+    today = datetime.date(2024, 5, 1)
+    habit_calendar = CalendarHeatmap.build(today, 15)
+
+    assert CalendarHeatmap.build(today, 15) is habit_calendar
+    assert CalendarHeatmap.build(today, 15, calendar.SUNDAY) is not habit_calendar
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        habit_calendar.today = today  # type: ignore
+
+
+def test_calendar_range():
+    start, end = datetime.date(2022, 3, 15), datetime.date(2024, 5, 1)
+    habit_calendar = CalendarHeatmap.build_range(start, end)
+
+    days = [day for week in zip(*habit_calendar.data) for day in week]
+    assert days[0] <= start < days[7]
+    assert days[-8] < end <= days[-1]
+    assert all((b - a).days == 1 for a, b in zip(days, days[1:]))
+    assert days[0].weekday() == calendar.MONDAY
+    assert len(habit_calendar.headers) == len(habit_calendar.data[0])
+    assert habit_calendar.month_last_day == end
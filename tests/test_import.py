@@ -0,0 +1,115 @@
+import io
+import json
+
+import pytest
+
+from beaverhabits.configs import RecordEncoding
+from beaverhabits.importer import (
+    HabitStreamParser,
+    ImportJob,
+    InvalidImport,
+    validate_habit,
+)
+from beaverhabits.storage.dict import DictHabitList
+
+from .test_storage import dummy_days, dummy_habit
+
+
+def exported(count: int) -> dict:
+    days = dummy_days(10)
+    habits = [dummy_habit(days[i:]).data for i in range(count)]
+    habits[-1] = DictHabitList({"habits": [habits[-1]]}).encoded(RecordEncoding.BITSET)[
+        "habits"
+    ][0]
+    return {"user_email": "a@b.c", "version": 12, "habits": habits, "n": 1.5}
+
+
+def parse(text: str, chunk_size: int) -> list:
+    parser = HabitStreamParser()
+    habits = []
+    for i in range(0, len(text), chunk_size):
+        habits.extend(parser.feed(text[i : i + chunk_size]))
+    habits.extend(parser.close())
+    return habits
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1024])
+def test_stream_parser(chunk_size):
+    data = exported(3)
+    for text in (json.dumps(data), json.dumps(data, indent=2)):
+        assert parse(text, chunk_size) == data["habits"]
+    assert parse('{"habits": []}', chunk_size) == []
+    assert parse("{}", chunk_size) == []
+
+
+@pytest.mark.parametrize(
+    "text",
+    ['{"habits": [{}', '{"habits": {}}', '{"habits": [1 2]}', "[]", "{} {}", '{"a"'],
+)
+def test_stream_parser_invalid(text):
+    with pytest.raises(InvalidImport):
+        parse(text, 4)
+
+
+def test_stream_parser_long_habit():
+    days = dummy_days(400)
+    habit = dummy_habit(days).data
+    habit["name"] = 'a "[quoted]" {name} \\'
+    text = json.dumps({"habits": [habit, {"name": "b"}]})
+
+    parser = HabitStreamParser()
+    habits = parser.feed(text[:100])
+    for i in range(100, len(text) - 100, 64):
+        habits.extend(parser.feed(text[i : i + 64]))
+        # The cut habit is kept aside, not decoded again with each chunk
+        assert parser.buffer == "" and habits == []
+    habits.extend(parser.feed(text[i + 64 :]))
+    habits.extend(parser.close())
+    assert habits == [habit, {"name": "b"}]
+
+
+def test_stream_parser_early_error():
+    parser = HabitStreamParser()
+    parser.feed('{"habits": [{"name": "a",')
+    # Reported once the habit is complete, before the end of the file
+    with pytest.raises(InvalidImport, match="char 29"):
+        parser.feed(' "b"}, {"name": ')
+
+
+def test_validate_habit():
+    habit = validate_habit({"id": "1", "name": "habit"})
+    assert habit.ticked_days == []
+
+    for d in (
+        {"records": []},
+        {"name": "habit", "records": [{"day": "2024-13-01", "done": True}]},
+        {"name": "habit", "records": [{"day": "2024-01-01", "done": "yes"}]},
+        {"name": "habit", "bitset": {"start": "2024-01-32", "bits": ""}},
+    ):
+        with pytest.raises(InvalidImport):
+            validate_habit(d)
+
+
+@pytest.mark.asyncio
+async def test_import_job(monkeypatch):
+    data = exported(3)
+    content = json.dumps(data).encode()
+    progress = []
+
+    monkeypatch.setattr("beaverhabits.importer.IMPORT_CHUNK_SIZE", 100)
+    job = ImportJob(io.BytesIO(content), len(content), on_progress=progress.append)
+    habit_list = await job.parse()
+    assert habit_list.data["habits"] == data["habits"]
+    assert progress == sorted(progress) and progress[-1] == 1
+    assert len(progress) == -(-len(content) // 100)
+
+    monkeypatch.setattr("beaverhabits.importer.settings.IMPORT_MAX_BYTES", 100)
+    with pytest.raises(InvalidImport):
+        await ImportJob(io.BytesIO(content), len(content)).parse()
+    # Uploads larger than their declared size
+    with pytest.raises(InvalidImport):
+        await ImportJob(io.BytesIO(content), 10).parse()
+
+    empty = json.dumps({"habits": []}).encode()
+    with pytest.raises(InvalidImport, match="No habits"):
+        await ImportJob(io.BytesIO(empty), len(empty)).parse()
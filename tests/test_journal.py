@@ -0,0 +1,78 @@
+import asyncio
+import datetime
+
+import pytest
+import pytest_asyncio
+from nicegui import core
+
+from beaverhabits.app.db import User
+from beaverhabits.configs import settings
+from beaverhabits.storage.flush import coalescer
+from beaverhabits.storage.user_journal import UserJournalDiskStorage
+from beaverhabits.views import dummy_habit_list
+
+
+@pytest_asyncio.fixture
+async def storage(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    core.loop = asyncio.get_running_loop()
+    yield UserJournalDiskStorage()
+    await coalescer.flush_all()
+    core.loop = None
+
+
+@pytest.mark.asyncio
+async def test_journal_replay(storage, tmp_path):
+    user = User(email="a@b.c")
+    day = datetime.date(2024, 5, 1)
+    await storage.save_user_habit_list(user, dummy_habit_list([day]))
+
+    habit_list = await storage.get_user_habit_list(user)
+    habit = habit_list.habits[0]
+    await habit.tick(day, True)
+    habit.name = "Renamed"
+    await habit_list.add("New")
+    await habit_list.remove(habit_list.habits[1])
+    await coalescer.flush_all()
+
+    log = (tmp_path / ".user" / "a@b.c.log").read_text()
+    assert len(log.splitlines()) == 4
+
+    habit_list = await UserJournalDiskStorage().get_user_habit_list(user)
+    names = [h.name for h in habit_list.habits]
+    assert len(names) == 5 and names[0] == "Renamed" and names[-1] == "New"
+    assert habit_list.habits[0].ticked_days == [day]
+
+
+@pytest.mark.asyncio
+async def test_journal_compaction(storage, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "HABITS_JOURNAL_COMPACT_OPS", 3)
+    user = User(email="a@b.c")
+    days = [datetime.date(2024, 5, i) for i in range(1, 5)]
+    await storage.save_user_habit_list(user, dummy_habit_list(days[:1]))
+
+    habit_list = await storage.get_user_habit_list(user)
+    for day in days:
+        await habit_list.habits[0].tick(day, True)
+    await coalescer.flush_all()
+
+    assert not (tmp_path / ".user" / "a@b.c.log").exists()
+    habit_list = await UserJournalDiskStorage().get_user_habit_list(user)
+    assert habit_list.habits[0].ticked_days == days
+
+
+@pytest.mark.asyncio
+async def test_journal_written_before_flush(storage, tmp_path):
+    user = User(email="a@b.c")
+    day = datetime.date(2024, 5, 1)
+    await storage.save_user_habit_list(user, dummy_habit_list([]))
+
+    habit_list = await storage.get_user_habit_list(user)
+    await habit_list.habits[0].tick(day, True)
+    habit_list.habits[1].name = "Renamed"
+
+    # As after a crash, before the coalescer flushed anything
+    assert coalescer.pending
+    reopened = await UserJournalDiskStorage().get_user_habit_list(user)
+    assert reopened.habits[0].ticked_days == [day]
+    assert reopened.habits[1].name == "Renamed"
@@ -0,0 +1,37 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from beaverhabits.app.password import HashingBusy, LoopTimer, PasswordHashExecutor
+
+
+def slow_hash(password: str) -> tuple[str, int]:
+    time.sleep(0.05)
+    return password[::-1], threading.get_ident()
+
+
+@pytest.mark.asyncio
+async def test_hash_off_loop():
+    executor = PasswordHashExecutor(max_workers=1, max_queue=0)
+    timer = LoopTimer(executor.run(slow_hash, "secret"))
+    hashed, thread = await timer
+
+    assert hashed == "terces"
+    assert thread != threading.get_ident()
+    assert executor.hash_seconds >= 0.05
+    assert timer.seconds < 0.05
+
+
+@pytest.mark.asyncio
+async def test_hash_queue_limit():
+    executor = PasswordHashExecutor(max_workers=1, max_queue=1)
+    results = await asyncio.gather(
+        *(executor.run(slow_hash, "secret") for _ in range(3)),
+        return_exceptions=True,
+    )
+
+    assert [isinstance(r, HashingBusy) for r in results] == [False, False, True]
+    assert executor.rejected == 1
+    assert executor.pending == 0
@@ -0,0 +1,45 @@
+from fastapi.routing import APIRoute
+from starlette.routing import Mount, Route
+
+from beaverhabits.routes import RouteKind, RouteTable, set_authorization
+
+
+def endpoint():
+    pass
+
+
+def test_route_table():
+    routes = [
+        Route("/docs", endpoint),
+        Mount("/_nicegui/1.4.37/static", routes=[]),
+        *(
+            APIRoute(path, endpoint)
+            for path in [
+                "/gui",
+                "/gui/habits/{habit_id}",
+                "/gui/habits/{habit_id}/heatmap",
+                "/login",
+                "/demo/habits/{habit_id}",
+            ]
+        ),
+    ]
+    table = RouteTable.compile(routes)
+
+    assert table.classify("/gui") == RouteKind.PROTECTED
+    assert table.classify("/gui/habits/abc") == RouteKind.PROTECTED
+    assert table.classify("/gui/habits/abc/heatmap") == RouteKind.PROTECTED
+    assert table.classify("/login") == RouteKind.UNRESTRICTED
+    assert table.classify("/demo/habits/abc") == RouteKind.UNRESTRICTED
+    assert table.classify("/_nicegui/1.4.37/static/quasar.js") == RouteKind.STATIC
+    assert table.classify("/docs") == RouteKind.API
+    assert table.classify("/unknown") == RouteKind.API
+
+
+def test_set_authorization():
+    headers = [(b"host", b"localhost"), (b"authorization", b"Basic x")]
+    set_authorization(headers, b"Bearer token")
+    assert headers == [(b"host", b"localhost"), (b"authorization", b"Bearer token")]
+
+    headers = [(b"host", b"localhost")]
+    set_authorization(headers, b"Bearer token")
+    assert headers[-1] == (b"authorization", b"Bearer token")
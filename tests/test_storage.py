@@ -0,0 +1,197 @@
+import copy
+import datetime
+
+import pytest
+from nicegui.observables import ObservableDict
+
+from beaverhabits.configs import RecordEncoding
+from beaverhabits.storage.bitset import Bitset
+from beaverhabits.storage.dict import DAY_MASK, DictHabit, DictHabitList
+
+
+def dummy_habit(days: list[datetime.date]) -> DictHabit:
+    records = [{"day": day.strftime(DAY_MASK), "done": True} for day in days]
+    return DictHabit({"id": "1", "name": "habit", "records": records})
+
+
+def dummy_days(count: int) -> list[datetime.date]:
+    today = datetime.date(2024, 5, 1)
+    return [today - datetime.timedelta(days=i) for i in reversed(range(count))]
+
+
+@pytest.mark.asyncio
+async def test_habit_tick():
+    days = dummy_days(3)
+    habit = dummy_habit(days[:2])
+
+    await habit.tick(days[0], False)
+    await habit.tick(days[2], True)
+
+    assert habit.ticked_days == days[1:]
+    assert len(habit.data["records"]) == 3
+    assert habit.get_record_by(days[0]).done is False
+
+
+@pytest.mark.asyncio
+async def test_habit_index_follows_shared_data():
+    days = dummy_days(2)
+    habit = dummy_habit([])
+    other = DictHabit(habit.data)
+
+    assert habit.ticked_days == []
+    await other.tick(days[0], True)
+    assert habit.ticked_days == [days[0]]
+
+    habit.data["records"] = [{"day": days[1].strftime(DAY_MASK), "done": True}]
+    assert habit.ticked_days == [days[1]]
+    assert habit.get_record_by(days[0]) is None
+
+
+@pytest.mark.parametrize("encoding", list(RecordEncoding))
+def test_habit_records_between(encoding):
+    days = dummy_days(30)
+    data = dummy_habit(days[::2]).encoded(encoding)
+    habit = DictHabit(data)
+
+    records = habit.get_records_between(days[10], days[14])
+    assert [r.day for r in records] == [days[10], days[12], days[14]]
+    assert all(r.done for r in records)
+    assert (
+        habit.get_records_between(days[-1] + datetime.timedelta(days=1), days[-1]) == []
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("encoding", list(RecordEncoding))
+async def test_habit_tick_many(encoding):
+    days = dummy_days(6)
+    changes = {days[0]: False, days[2]: False, days[4]: True, days[5]: True}
+    data = dummy_habit(days[:3]).encoded(encoding)
+
+    expected = DictHabit(copy.deepcopy(data))
+    for day, done in changes.items():
+        await expected.tick(day, done)
+
+    notified = []
+    habit = DictHabit(ObservableDict(data, on_change=notified.append))
+    ticks = []
+    habit.subscribe(lambda day, done: ticks.append((day, done)))
+    await habit.tick_many(changes)
+
+    assert habit.ticked_days == expected.ticked_days == [days[1], days[4], days[5]]
+    assert ticks == list(changes.items())
+    assert len(notified) == 1
+
+
+@pytest.mark.asyncio
+async def test_habit_tick_many_keeps_index():
+    days = dummy_days(4)
+    habit = dummy_habit(days[:3])
+    record = habit.get_record_by(days[0])
+    index = habit._records_index
+
+    await habit.tick_many({days[0]: False, days[1]: False})
+    await habit.tick_many({days[2]: False, days[3]: True})
+
+    assert habit._records_index is index
+    assert habit._indexed_records is habit.data["records"]
+    assert record.done is False
+    assert habit.get_record_by(days[1]).done is False
+    assert habit.ticked_days == [days[3]]
+
+
+def test_bitset_roundtrip():
+    days = dummy_days(20)[::3]
+    bitset = Bitset.decode(Bitset.from_days(days).encode())
+
+    assert list(bitset) == days
+    assert days[1] in bitset and days[1] + datetime.timedelta(days=1) not in bitset
+    assert list(Bitset.decode(Bitset().encode())) == []
+
+
+@pytest.mark.asyncio
+async def test_habit_bitset_encoding():
+    days = dummy_days(10)
+    habit_list = DictHabitList({"habits": [dummy_habit(days[2:5]).data]})
+
+    data = habit_list.encoded(RecordEncoding.BITSET)
+    habit = DictHabitList(data).habits[0]
+    assert habit.encoding == RecordEncoding.BITSET
+    assert habit.ticked_days == days[2:5]
+
+    await habit.tick(days[0], True)
+    await habit.tick(days[3], False)
+    await habit.tick(days[9], True)
+    assert habit.ticked_days == [days[0], days[2], days[4], days[9]]
+    assert habit.get_record_by(days[3]).done is False  # type: ignore
+    assert habit.get_record_by(days[5]) is None
+
+    data = DictHabitList(data).encoded(RecordEncoding.LIST)
+    habit = DictHabitList(data).habits[0]
+    assert habit.encoding == RecordEncoding.LIST
+    assert habit.ticked_days == [days[0], days[2], days[4], days[9]]
+    assert habit.get_record_by(days[3]).done is False  # type: ignore
+
+
+def test_habit_encoding_roundtrip():
+    days = dummy_days(5)
+    habit = dummy_habit(days[1:])
+    habit.data["records"][1]["done"] = False
+
+    bitset = DictHabit(habit.encoded(RecordEncoding.BITSET))
+    data = bitset.encoded(RecordEncoding.LIST)
+    assert data["records"] == habit.data["records"]
+    assert DictHabit(data).ticked_days == habit.ticked_days == [days[1], *days[3:]]
+    # Unchecked days keep their record both ways
+    assert bitset.get_record_by(days[2]).done is False  # type: ignore
+    assert DictHabit(data).get_record_by(days[2]).done is False  # type: ignore
+    assert bitset.get_record_by(days[0]) is None
+    assert [r.day for r in bitset.get_records_between(days[0], days[2])] == days[1:3]
+    assert DictHabit(data).encoded(RecordEncoding.BITSET) == bitset.data
+
+
+@pytest.mark.asyncio
+async def test_habit_list_cache():
+    habit_list = DictHabitList(
+        {"habits": [{"id": str(i), "name": str(i), "records": []} for i in range(3)]}
+    )
+
+    habits = habit_list.habits
+    assert habit_list.habits is habits
+    assert await habit_list.get_habit_by("1") is habits[1]
+
+    habits[2].star = True
+    assert [h.id for h in habit_list.habits] == ["2", "0", "1"]
+    assert habit_list.habits[0] is habits[2]
+
+    await habit_list.add("new")
+    await habit_list.remove(habits[0])
+    assert [h.name for h in habit_list.habits] == ["2", "1", "new"]
+    assert await habit_list.get_habit_by("0") is None
+
+
+@pytest.mark.asyncio
+async def test_habit_list_merge():
+    days = dummy_days(4)
+    habit_list = DictHabitList({"habits": []})
+    await habit_list.add("a")
+    await habit_list.add("b")
+    a, b = habit_list.habits
+    await a.tick(days[0], True)
+    await b.tick(days[3], True)
+
+    other = DictHabitList({"habits": [dummy_habit(days[1:3]).data]})
+    other.habits[0].id = a.id
+    await other.add("c")
+    # No new done days
+    await other.add("b")
+    other.data["habits"][-1].update(id=b.id, records=[])
+
+    result, stats = await habit_list.merge_stream(other.habits)
+    assert (stats.added, stats.merged, stats.unchanged) == (1, 1, 1)
+    assert [h.name for h in result.habits] == ["a", "b", "c"]
+
+    merged = await result.get_habit_by(a.id)
+    assert merged.ticked_days == days[:3]
+    assert a.ticked_days == days[:1]
+    assert result.data["habits"][1] is b.data
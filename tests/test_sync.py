@@ -0,0 +1,110 @@
+import datetime
+
+import pytest
+from nicegui import Client, ui
+from nicegui.page import page
+
+from beaverhabits.frontend.add_page import HabitEditList
+from beaverhabits.frontend.components import HabitCheckBox, HabitNameInput
+from beaverhabits.frontend.index_page import HabitListUI
+from beaverhabits.storage.dict import DictHabitList
+from beaverhabits.storage.storage import ChangeKind, HabitListChange
+
+from .test_storage import dummy_days, dummy_habit
+
+
+@pytest.mark.asyncio
+async def test_habit_list_changes():
+    days = dummy_days(2)
+    habit_list = DictHabitList({"habits": [dummy_habit(days).data]})
+    changes = []
+    habit_list.subscribe(changes.append)
+
+    habit = habit_list.habits[0]
+    await habit.tick_many({days[0]: False, days[1]: False})
+    habit.name = "renamed"
+    habit.star = True
+    await habit_list.add("new")
+    new_id = habit_list.habits[-1].id
+    await habit_list.remove(habit)
+
+    assert changes == [
+        HabitListChange(ChangeKind.TICK, "1", {days[0]: False, days[1]: False}),
+        HabitListChange(ChangeKind.NAME, "1"),
+        HabitListChange(ChangeKind.STAR, "1"),
+        HabitListChange(ChangeKind.ADD, new_id),
+        HabitListChange(ChangeKind.REMOVE, "1"),
+    ]
+    assert habit_list.version == 5
+
+
+def elements[T](client: Client, kind: type[T]) -> list[T]:
+    return [e for e in client.elements.values() if isinstance(e, kind)]
+
+
+@pytest.mark.asyncio
+async def test_index_pages_share_changes():
+    days = dummy_days(3)
+    habit_list = DictHabitList({"habits": [dummy_habit(days).data]})
+
+    clients = [Client(page("/"), request=None) for _ in range(2)]
+    for client in clients:
+        with client:
+            HabitListUI(days, habit_list)
+
+    # Changes made on the first page show up on the second one
+    with clients[0]:
+        await elements(clients[0], HabitCheckBox)[0].habit.tick(days[0], False)
+        habit_list.habits[0].name = "renamed"
+        await habit_list.add("new")
+
+    other = elements(clients[1], HabitListUI)[0]
+    assert list(other.rows) == [h.id for h in habit_list.habits]
+    assert other.rows["1"].habit_name.text == "renamed"
+    assert elements(clients[1], HabitCheckBox)[0].value is False
+
+    for client in clients:
+        client.remove_all_elements()
+    assert habit_list._listeners == []
+
+
+@pytest.mark.asyncio
+async def test_add_page_keeps_own_input():
+    habit_list = DictHabitList({"habits": [dummy_habit([]).data]})
+    clients = [Client(page("/"), request=None) for _ in range(2)]
+    for client in clients:
+        with client:
+            HabitEditList(habit_list)
+    inputs = [elements(client, HabitNameInput)[0] for client in clients]
+
+    # Renamed while typing on the first page
+    with inputs[0]:
+        habit_list.habits[0].name = "renamed"
+    assert elements(clients[0], HabitNameInput) == [inputs[0]]
+    assert elements(clients[1], HabitNameInput)[0].value == "renamed"
+
+    await habit_list.add("new")
+    assert len(elements(clients[0], ui.grid)) == 2
+
+
+@pytest.mark.asyncio
+async def test_index_row_follows_new_habit():
+    days = dummy_days(3)
+    habit_list = DictHabitList({"habits": [dummy_habit(days).data]})
+    client = Client(page("/"), request=None)
+    with client:
+        ui_list = HabitListUI(days, habit_list)
+
+    # Reloaded habit list, same habit ids
+    old = habit_list.habits[0]
+    ui_list.habits = habit_list = DictHabitList({"habits": [dummy_habit(days).data]})
+    ui_list.refresh()
+    habit = habit_list.habits[0]
+    assert old._listeners == []
+
+    with client:
+        await habit.tick(days[0], False)
+    assert elements(client, HabitCheckBox)[0].value is False
+
+    client.remove_all_elements()
+    assert habit._listeners == []
@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+from nicegui import background_tasks
+
+from beaverhabits.app import auth, crud
+from beaverhabits.storage.dict import DictHabitList
+from beaverhabits.storage.user_db_table import MIGRATED_KEY, UserTableDatabaseStorage
+
+from .test_auth import database  # noqa: F401
+from .test_cache import loop  # noqa: F401
+from .test_storage import dummy_days, dummy_habit
+
+
+async def wait_background_tasks() -> None:
+    while background_tasks.running_tasks:
+        await asyncio.gather(*background_tasks.running_tasks)
+
+
+def legacy_habit_list(days) -> dict:
+    habit = dummy_habit(days).data
+    habit["star"] = False
+    habit["records"][0]["done"] = False
+    return {"habits": [habit, {"id": "2", "name": "b", "star": True, "records": []}]}
+
+
+def by_id(habit_list: DictHabitList) -> dict:
+    return {h.id: h.data for h in habit_list.habits}
+
+
+@pytest.mark.asyncio
+async def test_migrate_legacy_habit_list(database, loop):
+    storage = UserTableDatabaseStorage()
+    user = await auth.user_create("test@example.com", "password")
+    assert await storage.get_user_habit_list(user) is None
+
+    days = dummy_days(3)
+    data = legacy_habit_list(days)
+    await crud.update_user_habit_list(user, data)
+
+    habit_list = await storage.get_user_habit_list(user)
+    assert habit_list is not None
+    assert by_id(habit_list) == by_id(DictHabitList(data))
+    legacy = await crud.get_user_habit_list(user)
+    assert legacy is not None and legacy.data[MIGRATED_KEY] is True
+
+    # Migrated once, later loads only read the habit tables
+    database.clear()
+    habit_list = await storage.get_user_habit_list(user)
+    assert habit_list is not None and by_id(habit_list) == by_id(DictHabitList(data))
+    assert not any("habit_list" in q for q in database)
+    assert not any(q.lstrip().startswith("INSERT") for q in database)
+
+
+@pytest.mark.asyncio
+async def test_table_storage_writes(database, loop):
+    storage = UserTableDatabaseStorage()
+    user = await auth.user_create("test@example.com", "password")
+    days = dummy_days(5)
+    await crud.update_user_habit_list(user, legacy_habit_list(days[:3]))
+    habit_list = await storage.get_user_habit_list(user)
+    assert habit_list is not None
+
+    habit = await habit_list.get_habit_by("1")
+    assert habit is not None
+    database.clear()
+    await habit.tick(days[3], True)
+    await habit.tick_many({days[0]: True, days[1]: False})
+    assert sum(q.lstrip().startswith("INSERT") for q in database) == 2
+
+    habit.name = "renamed"
+    habit.star = True
+    await wait_background_tasks()
+
+    loaded = await storage.get_user_habit_list(user)
+    assert loaded is not None
+    habit = await loaded.get_habit_by("1")
+    assert habit is not None
+    assert habit.name == "renamed" and habit.star
+    assert habit.ticked_days == [days[0], days[2], days[3]]
+    assert habit.get_record_by(days[1]).done is False  # type: ignore
+
+    records = await crud.get_user_habit_records(user, days[1], days[2])
+    assert [(r.day, r.done) for r in records] == [(days[1], False), (days[2], True)]
+    assert [r.day for r in habit.get_records_between(days[1], days[3])] == days[1:4]
+
+
+@pytest.mark.asyncio
+async def test_table_storage_add_remove(database, loop):
+    storage = UserTableDatabaseStorage()
+    user = await auth.user_create("test@example.com", "password")
+    days = dummy_days(3)
+    await storage.save_user_habit_list(user, DictHabitList(legacy_habit_list(days)))
+    habit_list = await storage.get_user_habit_list(user)
+    assert habit_list is not None
+
+    await habit_list.add("new")
+    new = habit_list.habits[-1]
+    await new.tick(days[0], True)
+
+    habit = await habit_list.get_habit_by("1")
+    await habit_list.remove(habit)  # type: ignore
+    assert habit_list.pks.keys() == {"2", new.id}  # type: ignore
+
+    loaded = await storage.get_user_habit_list(user)
+    assert loaded is not None
+    assert [h.id for h in loaded.habits] == ["2", new.id]
+    assert (await loaded.get_habit_by(new.id)).ticked_days == [days[0]]  # type: ignore
+
+    # Records of the removed habit are gone too
+    records = await crud.get_user_habit_records(user)
+    assert [r.day for r in records] == [days[0]]